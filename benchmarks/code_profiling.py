@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 10:12:45 2026
+
+Checks that the wrapper can profile its own code with cProfile while several
+jobs run in parallel: simulate_HAs.py is run with --profile, --profile_code
+cprofile and --jobs > 1 on a synthetic xml, with the stand-in
+fake_simulateSB/simulateSB.py on the PATH. The run has to finish within a time
+limit and write a profile that contains the functions executed by the
+parallel jobs and by the threads streaming the output. Use --python to run
+the wrapper with another interpreter (cProfile works differently from python
+3.12 on).
+"""
+
+#usage of this script:
+# python code_profiling.py --jobs 4 --python <python interpreter>
+
+import argparse
+import json
+import os
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+
+benchmark_folder = os.path.dirname(os.path.abspath(__file__))
+fake_simulateSB_folder = os.path.join(benchmark_folder,'fake_simulateSB')
+simulate_HAs_script = os.path.join(os.path.dirname(benchmark_folder),'simulate_HAs.py')
+
+xml_str = """<?xml version="1.0" encoding="UTF-8"?>
+<sbl:SchedBlock xmlns:sbl="Alma/ObsPrep/SchedBlock" xmlns:prj="Alma/ObsPrep/ObsProject"
+                xmlns:val="Alma/ValueTypes">
+    <prj:name>profiling_SB</prj:name>
+    <sbl:modeName>Standard Interferometry</sbl:modeName>
+    <sbl:SchedulingConstraints>
+        <sbl:representativeCoordinates>
+            <val:longitude unit="deg">83.6</val:longitude>
+            <val:latitude unit="deg">-5.4</val:latitude>
+        </sbl:representativeCoordinates>
+        <sbl:nominalConfiguration>C43-3</sbl:nominalConfiguration>
+    </sbl:SchedulingConstraints>
+</sbl:SchedBlock>
+"""
+#functions that only run in the parallel jobs and the streaming threads:
+functions_of_threads = ['simulate_HA','stream_pipe']
+
+def run_wrapper(python,n_jobs,folder,max_seconds):
+    xml_filepath = os.path.join(folder,'profiling_SB.xml')
+    with open(xml_filepath,'w') as file:
+        file.write(xml_str)
+    env = dict(os.environ)
+    env['PATH'] = fake_simulateSB_folder+os.pathsep+env.get('PATH','')
+    env['FAKE_SIMULATESB_PROFILE'] = json.dumps({'sleep_s':0.05,'failure_rate':0})
+    command = [python,simulate_HAs_script,xml_filepath,'c43-3','--min_HA','-2',
+               '--max_HA','2','--HA_step','1','--jobs',str(n_jobs),'--no_cache',
+               '--profile','--profile_code','cprofile',
+               #the durations of the fake must not end up in the real history
+               '--duration_history',os.path.join(folder,'durations.json')]
+    try:
+        #all questions of the wrapper are answered with the default (yes)
+        process = subprocess.run(command,cwd=folder,env=env,input='\n'*100,text=True,
+                                 capture_output=True,timeout=max_seconds)
+    except subprocess.TimeoutExpired:
+        raise AssertionError(f'no result after {max_seconds}s, the wrapper hangs')
+    assert process.returncode == 0,\
+              f'wrapper failed (return code {process.returncode}):\n{process.stderr}'
+    return xml_filepath
+
+def check_profile(xml_filepath):
+    profile_filepath = f'{xml_filepath}_cprofile.prof'
+    assert os.path.exists(profile_filepath),f'{profile_filepath} was not written'
+    stats = pstats.Stats(profile_filepath)
+    profiled_functions = set(function for _,_,function in stats.stats)
+    missing = [f for f in functions_of_threads if f not in profiled_functions]
+    assert len(missing) == 0,f'functions of the threads not in the profile: {missing}'
+    assert os.path.exists(f'{xml_filepath}_timing.json'),'timing report was not written'
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--jobs',type=int,default=4)
+parser.add_argument('--python',default=sys.executable)
+parser.add_argument('--max_seconds',type=float,default=120)
+args = parser.parse_args()
+if args.jobs < 2:
+    sys.exit('the check needs at least 2 jobs')
+
+folder = tempfile.mkdtemp(prefix='simulateSB_code_profiling_')
+try:
+    xml_filepath = run_wrapper(python=args.python,n_jobs=args.jobs,folder=folder,
+                               max_seconds=args.max_seconds)
+    check_profile(xml_filepath=xml_filepath)
+except AssertionError as error:
+    print(f'FAILED: {error}')
+    failed = True
+else:
+    print(f'ok: --profile_code cprofile with {args.jobs} jobs, profile includes'
+          +f' {", ".join(functions_of_threads)}')
+    failed = False
+finally:
+    shutil.rmtree(folder)
+if failed:
+    sys.exit('code profiling check failed')
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 19 09:14:52 2026
+
+Stand-in for getsb.py, used to test the SB xml retrieval of the wrapper without
+access to the archive (set the environment variable GETSB_SCRIPT to this file).
+It prints a minimal SB xml for the requested SB; SB names starting with
+'missing' are treated as unknown SBs. Each invocation is appended to the file
+given by the environment variable FAKE_GETSB_LOG (if set).
+"""
+
+import argparse
+import os
+import sys
+
+xml_template = """<?xml version="1.0" encoding="UTF-8"?>
+<sbl:SchedBlock xmlns:sbl="Alma/ObsPrep/SchedBlock" xmlns:prj="Alma/ObsPrep/ObsProject"
+                xmlns:val="Alma/ValueTypes">
+    <prj:name>{SB}</prj:name>
+    <prj:note>{project_code}</prj:note>
+    <sbl:modeName>Standard Interferometry</sbl:modeName>
+    <sbl:SchedulingConstraints>
+        <sbl:representativeCoordinates>
+            <val:longitude unit="deg">45.0</val:longitude>
+            <val:latitude unit="deg">-30.0</val:latitude>
+        </sbl:representativeCoordinates>
+        <sbl:nominalConfiguration>C43-3</sbl:nominalConfiguration>
+    </sbl:SchedulingConstraints>
+</sbl:SchedBlock>"""
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-p',dest='project_code',required=True)
+parser.add_argument('-s',dest='SB',required=True)
+parser.add_argument('-S',dest='server',default=None)
+args = parser.parse_args()
+
+log_filepath = os.getenv('FAKE_GETSB_LOG')
+if log_filepath is not None:
+    with open(log_filepath,'a') as file:
+        file.write(f'{args.project_code} {args.SB}\n')
+if args.SB.startswith('missing'):
+    sys.exit(f'SB {args.SB} not found in project {args.project_code}')
+print(xml_template.format(SB=args.SB,project_code=args.project_code))
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:40:27 2026
+
+Stand-in for the heavy modules imported by simulateSB.py (ALMA/CASA software,
+catalogs). Importing it takes as long as given by "import_s" in the profile of
+the fake simulateSB.py.
+"""
+
+import json
+import os
+import time
+
+time.sleep(json.loads(os.getenv('FAKE_SIMULATESB_PROFILE','{}')).get('import_s',0))
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:20:11 2026
+
+Stand-in for simulateSB.py, used to benchmark the wrapper without the ALMA
+software. It accepts the same arguments as used by the wrapper, produces
+stdout/stderr output, calibrator query tables (with --writeQueryLog) and
+SimulatedCalResultsData.dat, and sleeps or fails according to a profile given
+as JSON in the environment variable FAKE_SIMULATESB_PROFILE, e.g.
+{"sleep_s":0.5,"stdout_lines":2000,"stderr_lines":20,"failure_rate":0.2}
+The time needed to import the ALMA software can be emulated with "import_s".
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import fake_alma_modules
+
+default_profile = {'sleep_s':0,'stdout_lines':500,'stderr_lines':10,
+                   'failure_rate':0.2,'n_calibrators':15,'rejected_fraction':0.5}
+calibrator_query_identifiers = ['diffgain','bandpass','phase','check']
+
+parser = argparse.ArgumentParser()
+parser.add_argument('xml_file')
+parser.add_argument('epoch')
+parser.add_argument('-C',dest='array_config',default=None)
+parser.add_argument('--writeQueryLog',action='store_true')
+args = parser.parse_args()
+
+profile = dict(default_profile)
+profile.update(json.loads(os.getenv('FAKE_SIMULATESB_PROFILE','{}')))
+
+if args.array_config is not None and args.array_config.endswith('.cfg')\
+                               and not os.path.isfile(args.array_config):
+    sys.exit(f'configuration file {args.array_config} not found (cwd {os.getcwd()})')
+array_config_name = None if args.array_config is None\
+                         else os.path.basename(args.array_config)
+
+#deterministic pseudo-random number for this simulation, such that repeated
+#benchmarks are comparable
+digest = hashlib.sha256(f'{args.xml_file},{args.epoch},{array_config_name}'.encode())
+random_number = int(digest.hexdigest()[:8],16)/16**8
+
+log_prefix = f'log_{args.xml_file}'
+for i in range(profile['stdout_lines']):
+    print(f'INFO: simulating {args.xml_file} at {args.epoch}, step {i}: '
+          +'checking scheduling constraints and calibrator availability')
+for i in range(profile['stderr_lines']):
+    print(f'WARNING: deprecated option used in step {i}',file=sys.stderr)
+
+if args.writeQueryLog:
+    #the diffgain query is only done for some SBs
+    cal_types = calibrator_query_identifiers if random_number < 0.3\
+                                             else calibrator_query_identifiers[1:]
+    for cal_type in cal_types:
+        with open(f'{log_prefix}_{cal_type}_1.txt','w') as file:
+            file.write(f'# {cal_type} calibrator query for {args.epoch}\n')
+            file.write('| Source | Flux [Jy] | Separation [deg] | Elevation [deg] |'
+                       +' Reason |\n')
+            for i in range(profile['n_calibrators']):
+                name = f'J{(1000+37*i)%2400:04d}-{(1000+53*i)%9000:04d}'
+                rejected = (i/profile['n_calibrators']+random_number)%1\
+                                                   < profile['rejected_fraction']
+                reason = 'insufficient flux' if rejected else ''
+                file.write(f'| [{name}] ICRS | {0.1+i/10:.2f} | {3+i:.1f} |'
+                           +f' {40+i%30:.1f} | {reason} |\n')
+with open(f'{log_prefix}_main.txt','w') as file:
+    file.write(f'simulation of {args.xml_file} at {args.epoch}\n')
+with open('SimulatedCalResultsData.dat','w') as file:
+    file.write('# calibrator type flux_Jy snr time_min\n')
+    for i,cal_type in enumerate(calibrator_query_identifiers[1:]):
+        file.write(f'J{1000+i:04d}-{2000+i:04d} {cal_type} {0.5+i:.2f}'
+                   +f' {20+10*random_number:.2f} {5+i:.1f}\n')
+
+time.sleep(profile['sleep_s'])
+if random_number < profile['failure_rate']:
+    print('ERROR: no suitable phase calibrator found',file=sys.stderr)
+    sys.exit(1)
+print('simulation successful')
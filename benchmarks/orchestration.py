@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 13:48:30 2026
+
+Benchmarks the orchestration of the wrapper (i.e. everything except
+simulateSB.py itself). The stand-in fake_simulateSB/simulateSB.py is put on the
+PATH, and simulate_HAs.py is run in-process on synthetic .xml/.aot inputs with
+different numbers of SBs and HAs. For each scenario, the throughput, the
+overhead per simulation and the memory usage of the wrapper are reported.
+The overhead per simulation is the wall time beyond the sleep time of the fake
+simulateSB.py (assuming perfect packing on the parallel jobs), so it includes
+the runtime of the fake itself, which is measured separately for reference.
+"""
+
+#usage of this script:
+# python orchestration.py --SBs 1 20 200 --HAs 5 100 --jobs 8
+# --profile '{"sleep_s":0.1}' --engine persistent --output <results.json>
+# --compare <previous results.json>
+
+import argparse
+import datetime
+import io
+import json
+import os
+import resource
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+benchmark_folder = os.path.dirname(os.path.abspath(__file__))
+fake_simulateSB_folder = os.path.join(benchmark_folder,'fake_simulateSB')
+repository_folder = os.path.dirname(benchmark_folder)
+simulate_HAs_script = os.path.join(repository_folder,'simulate_HAs.py')
+#such that simulate_HAs.py can import simulator.py when run in-process:
+sys.path.insert(0,repository_folder)
+
+xml_template = """<?xml version="1.0" encoding="UTF-8"?>
+<sbl:SchedBlock xmlns:sbl="Alma/ObsPrep/SchedBlock" xmlns:prj="Alma/ObsPrep/ObsProject"
+                xmlns:val="Alma/ValueTypes">
+    <prj:name>{SB_name}</prj:name>
+    <sbl:modeName>Standard Interferometry</sbl:modeName>
+    <sbl:SchedulingConstraints>
+        <sbl:representativeCoordinates>
+            <val:longitude unit="deg">{ra}</val:longitude>
+            <val:latitude unit="deg">{dec}</val:latitude>
+        </sbl:representativeCoordinates>
+        <sbl:nominalConfiguration>C43-3</sbl:nominalConfiguration>
+    </sbl:SchedulingConstraints>
+</sbl:SchedBlock>
+"""
+
+def get_xml_str(SB_index):
+    return xml_template.format(SB_name=f'benchmark_SB_{SB_index:03d}',
+                               ra=(SB_index*17)%360,dec=-60+(SB_index*7)%80)
+
+def create_input(n_SBs,folder):
+    if n_SBs == 1:
+        filepath = os.path.join(folder,'benchmark_SB_000.xml')
+        with open(filepath,'w') as file:
+            file.write(get_xml_str(SB_index=0))
+        return filepath
+    filepath = os.path.join(folder,'benchmark.aot')
+    with zipfile.ZipFile(filepath,'w') as aot:
+        aot.writestr('ObsProject.xml','<prj:ObsProject/>')
+        for i in range(n_SBs):
+            aot.writestr(f'SchedBlock{i}.xml',get_xml_str(SB_index=i))
+    return filepath
+
+def run_wrapper(arguments):
+    #all questions of the wrapper are answered with the default (yes)
+    stdin,stdout,argv = sys.stdin,sys.stdout,sys.argv
+    sys.stdin = io.StringIO('\n'*10000)
+    sys.stdout = io.StringIO()
+    sys.argv = [simulate_HAs_script,]+arguments
+    try:
+        runpy.run_path(simulate_HAs_script,run_name='__main__')
+    finally:
+        sys.stdin,sys.stdout,sys.argv = stdin,stdout,argv
+
+def run_scenario(n_SBs,n_HAs,n_jobs,profile,engine):
+    folder = tempfile.mkdtemp(prefix='simulateSB_benchmark_')
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        input_file = create_input(n_SBs=n_SBs,folder=folder)
+        arguments = [input_file,'c43-3','--min_HA','0','--max_HA',str(n_HAs-1),
+                     '--HA_step','1','--writeQueryLog','--jobs',str(n_jobs),
+                     '--no_cache','--engine',engine,
+                     #the durations of the fake must not end up in the real history
+                     '--duration_history',os.path.join(folder,'durations.json')]
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        run_wrapper(arguments=arguments)
+        duration = time.perf_counter()-start_time
+        _,peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(folder)
+    n_simulations = n_SBs*n_HAs
+    #time the simulations would take with perfect packing and zero overhead:
+    ideal_duration = n_simulations*profile.get('sleep_s',0)/n_jobs
+    return {'n_SBs':n_SBs,'n_HAs':n_HAs,'n_jobs':n_jobs,'engine':engine,
+            'n_simulations':n_simulations,
+            'duration_s':duration,'throughput_per_s':n_simulations/duration,
+            'overhead_per_simulation_ms':(duration-ideal_duration)/n_simulations*1e3,
+            'peak_python_memory_MB':peak_memory/1e6,
+            #ru_maxrss is in kB and is the maximum over the whole benchmark
+            'max_rss_MB':resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1e3}
+
+def measure_fake_simulateSB(repeat=5):
+    #duration of the fake simulateSB.py alone (i.e. without the wrapper), as a
+    #reference for the overhead per simulation
+    folder = tempfile.mkdtemp(prefix='simulateSB_benchmark_')
+    start_time = time.perf_counter()
+    for i in range(repeat):
+        subprocess.run(['simulateSB.py','SB.xml',f'TRANSIT+{i}h','--writeQueryLog'],
+                       cwd=folder,stdout=subprocess.DEVNULL,stderr=subprocess.DEVNULL)
+    duration = (time.perf_counter()-start_time)/repeat
+    shutil.rmtree(folder)
+    return duration
+
+def get_git_revision():
+    try:
+        return subprocess.run(['git','rev-parse','--short','HEAD'],cwd=benchmark_folder,
+                              capture_output=True,text=True).stdout.strip()
+    except OSError:
+        return None
+
+def print_result(result,previous=None):
+    line = f'{result["n_SBs"]:>5} SBs x {result["n_HAs"]:>4} HAs, {result["n_jobs"]:>3} jobs'\
+           +f' ({result.get("engine","subprocess")}):'\
+           +f' {result["duration_s"]:8.2f}s, {result["throughput_per_s"]:8.1f} sim/s,'\
+           +f' overhead {result["overhead_per_simulation_ms"]:7.1f} ms/sim,'\
+           +f' python memory {result["peak_python_memory_MB"]:7.1f} MB'
+    if previous is not None:
+        ratio = result['throughput_per_s']/previous['throughput_per_s']
+        line += f' (throughput x{ratio:.2f} compared to previous)'
+    print(line)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--SBs',type=int,nargs='+',default=[1,20])
+parser.add_argument('--HAs',type=int,nargs='+',default=[5,20])
+parser.add_argument('--jobs',type=int,default=os.cpu_count())
+parser.add_argument('--profile',type=str,default='{}',
+                    help='profile of the fake simulateSB.py (JSON)')
+parser.add_argument('--engine',choices=['subprocess','persistent'],default='subprocess')
+parser.add_argument('--output',type=str,default=None)
+parser.add_argument('--compare',type=str,default=None)
+args = parser.parse_args()
+
+profile = json.loads(args.profile)
+os.environ['FAKE_SIMULATESB_PROFILE'] = args.profile
+os.environ['PATH'] = fake_simulateSB_folder+os.pathsep+os.environ['PATH']
+previous_results = {}
+if args.compare is not None:
+    with open(args.compare,'r') as file:
+        for result in json.load(file)['results']:
+            previous_results[(result['n_SBs'],result['n_HAs'],result['n_jobs'],
+                              result.get('engine','subprocess'))] = result
+
+fake_duration = measure_fake_simulateSB()
+print(f'fake simulateSB.py alone (without wrapper): {fake_duration*1e3:.1f} ms/sim')
+results = []
+for n_SBs in args.SBs:
+    for n_HAs in args.HAs:
+        result = run_scenario(n_SBs=n_SBs,n_HAs=n_HAs,n_jobs=args.jobs,profile=profile,
+                              engine=args.engine)
+        print_result(result=result,
+                     previous=previous_results.get((n_SBs,n_HAs,args.jobs,args.engine)))
+        results.append(result)
+if args.output is not None:
+    with open(args.output,'w') as file:
+        json.dump({'date':datetime.datetime.now().isoformat(timespec='seconds'),
+                   'git_revision':get_git_revision(),'profile':profile,
+                   'fake_simulateSB_duration_s':fake_duration,
+                   'results':results},file,indent=1)
+    print(f'results written to {args.output}')
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 10:12:37 2026
+
+Measures how long simulate_HAs.py takes to start up, i.e. to print the help
+and to reject invalid arguments. Both should return almost instantly, since
+nothing heavy (e.g. astropy) is imported at startup.
+"""
+
+#usage of this script:
+# python startup_time.py --repeat <number of repetitions> --max_seconds <limit>
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)),'..',
+                      'simulate_HAs.py')
+commands = {'help':[script,'--help'],
+            'invalid HA step':[script,'SB.xml','c43-3','--HA_step','-1']}
+
+def measure(arguments,repeat):
+    durations = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable,]+arguments,stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter()-start)
+    return durations
+
+def measure_python_startup(repeat):
+    #reference: startup of the bare interpreter
+    return measure(arguments=['-c','pass'],repeat=repeat)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--repeat',type=int,default=10)
+parser.add_argument('--max_seconds',type=float,default=None)
+args = parser.parse_args()
+
+reference = statistics.median(measure_python_startup(repeat=args.repeat))
+print(f'python startup: {reference:.3f}s (median of {args.repeat})')
+too_slow = False
+for name,arguments in commands.items():
+    median = statistics.median(measure(arguments=arguments,repeat=args.repeat))
+    print(f'{name}: {median:.3f}s (median of {args.repeat}), {median-reference:.3f}s'
+          +' more than python startup')
+    if args.max_seconds is not None and median > args.max_seconds:
+        too_slow = True
+if too_slow:
+    sys.exit(f'startup took longer than {args.max_seconds}s')
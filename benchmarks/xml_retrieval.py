@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 19 09:31:08 2026
+
+Checks the SB xml retrieval of the wrapper (OT_XML_File.retrieve_xml_strs)
+with the stand-in fake_getsb/getsb.py: several SBs are downloaded in one
+batch and split correctly, cached xmls are used without any download, stale
+xmls are downloaded again, and a failed download is reported. The local xml
+cache is redirected into a temporary folder.
+"""
+
+#usage of this script:
+# python xml_retrieval.py --SBs <number of SBs>
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+benchmark_folder = os.path.dirname(os.path.abspath(__file__))
+fake_getsb_script = os.path.join(benchmark_folder,'fake_getsb','getsb.py')
+sys.path.insert(0,os.path.dirname(benchmark_folder))
+import simulator
+
+project_code = '2099.1.00001.S'
+
+def read_getsb_log(log_filepath):
+    if not os.path.exists(log_filepath):
+        return []
+    with open(log_filepath,'r') as file:
+        return [line.split()[1] for line in file]
+
+def retrieve(SBs,log_filepath,max_age_hours=1):
+    #returns the xml strings, the SBs requested from getsb.py and the number of
+    #getsb batches (i.e. shell or ssh invocations)
+    if os.path.exists(log_filepath):
+        os.remove(log_filepath)
+    n_batches = 0
+    download_xml_strs = simulator.OT_XML_File.download_xml_strs
+    def count_batches(project_code,SBs):
+        nonlocal n_batches
+        n_batches += 1
+        return download_xml_strs(project_code=project_code,SBs=SBs)
+    simulator.OT_XML_File.download_xml_strs = count_batches
+    try:
+        xml_strs = simulator.OT_XML_File.retrieve_xml_strs(
+                        project_code=project_code,SBs=SBs,max_age_hours=max_age_hours)
+    finally:
+        simulator.OT_XML_File.download_xml_strs = download_xml_strs
+    return xml_strs,read_getsb_log(log_filepath=log_filepath),n_batches
+
+def check_xml_strs(xml_strs,SBs):
+    assert sorted(xml_strs) == sorted(SBs),f'xmls of {list(xml_strs)} instead of {SBs}'
+    for SB,xml_str in xml_strs.items():
+        xml = simulator.OT_XML_File(filepath=None,xml_str=xml_str)
+        assert xml.get_SB_name() == SB,f'xml of {xml.get_SB_name()} returned for {SB}'
+
+def check_downloads(requested,expected,n_batches,expected_batches):
+    assert sorted(requested) == sorted(expected),\
+                   f'getsb.py called for {requested} instead of {expected}'
+    assert n_batches == expected_batches,\
+                   f'{n_batches} getsb batches instead of {expected_batches}'
+
+def run_checks(SBs,log_filepath):
+    xml_strs,requested,n_batches = retrieve(SBs=SBs,log_filepath=log_filepath)
+    check_xml_strs(xml_strs=xml_strs,SBs=SBs)
+    check_downloads(requested=requested,expected=SBs,n_batches=n_batches,
+                    expected_batches=1)
+    yield f'{len(SBs)} SBs downloaded in one batch'
+
+    xml_strs,requested,n_batches = retrieve(SBs=SBs,log_filepath=log_filepath)
+    check_xml_strs(xml_strs=xml_strs,SBs=SBs)
+    check_downloads(requested=requested,expected=[],n_batches=n_batches,
+                    expected_batches=0)
+    yield 'cached xmls used without download'
+
+    stale_SB = SBs[0]
+    stale_time = time.time()-2*3600
+    os.utime(simulator.OT_XML_File.get_cached_xml_filepath(project_code=project_code,
+                                                           SB=stale_SB),
+             (stale_time,stale_time))
+    new_SB = 'new_SB'
+    xml_strs,requested,n_batches = retrieve(SBs=SBs+[new_SB,],log_filepath=log_filepath)
+    check_xml_strs(xml_strs=xml_strs,SBs=SBs+[new_SB,])
+    check_downloads(requested=requested,expected=[stale_SB,new_SB],n_batches=n_batches,
+                    expected_batches=1)
+    yield 'stale and new xmls downloaded again in one batch, others from the cache'
+
+    xml_strs,requested,n_batches = retrieve(SBs=SBs,log_filepath=log_filepath,
+                                            max_age_hours=0)
+    check_downloads(requested=requested,expected=SBs,n_batches=n_batches,
+                    expected_batches=1)
+    yield 'all xmls downloaded with max age 0'
+
+    try:
+        retrieve(SBs=['missing_SB',]+SBs,log_filepath=log_filepath,max_age_hours=0)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('no error for an SB that cannot be downloaded')
+    assert not os.path.exists(simulator.OT_XML_File.get_cached_xml_filepath(
+                                        project_code=project_code,SB='missing_SB'))
+    yield 'failed download reported, nothing cached'
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--SBs',type=int,default=5)
+args = parser.parse_args()
+
+folder = tempfile.mkdtemp(prefix='simulateSB_xml_retrieval_')
+simulator.OT_XML_File.xml_cache_folder = os.path.join(folder,'xml_cache')
+log_filepath = os.path.join(folder,'getsb_log.txt')
+os.environ['GETSB_SCRIPT'] = fake_getsb_script
+os.environ['FAKE_GETSB_LOG'] = log_filepath
+SBs = [f'SB_{i:03d}' for i in range(args.SBs)]
+failed = False
+try:
+    try:
+        for description in run_checks(SBs=SBs,log_filepath=log_filepath):
+            print(f'ok: {description}')
+    except AssertionError as error:
+        print(f'FAILED: {error}')
+        failed = True
+finally:
+    shutil.rmtree(folder)
+if failed:
+    sys.exit('xml retrieval check failed')
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 16:05:12 2026
+
+Long-lived worker used by the persistent engine of simulator.py (--engine
+persistent). It imports the modules used by simulateSB.py once, and then runs
+one simulation per request by forking a child that executes simulateSB.py,
+such that the interpreter startup and the imports are not repeated for every
+epoch, while each simulation still runs in its own process.
+"""
+
+#usage of this script (started by simulator.py, not by the user):
+# python simulateSB_worker.py <path of simulateSB.py>
+#requests are read from stdin, one JSON object per line:
+# {"cwd": <working dir>, "argv": [<arguments>], "stdout": <fifo>, "stderr": <fifo>}
+#for each request, three JSON lines are written to stdout:
+# {"pid": <pid of the simulation>} when the simulation has started,
+# {"exited": true} when it has exited (it is then only reaped after an empty
+# line was read from stdin, such that its pid is not reused while simulator.py
+# may still kill it), and
+# {"returncode": <return code>, "maxrss_kB": <peak memory>} when it was reaped
+
+import ast
+import importlib
+import json
+import os
+import sys
+import traceback
+
+def preload_modules(source):
+    #imports the top-level imports of simulateSB.py; failures are ignored here,
+    #they will show up when simulateSB.py is executed
+    for node in ast.parse(source).body:
+        if isinstance(node,ast.Import):
+            module_names = [alias.name for alias in node.names]
+        elif isinstance(node,ast.ImportFrom) and node.level == 0 and node.module:
+            module_names = [node.module,]
+        else:
+            continue
+        for module_name in module_names:
+            try:
+                importlib.import_module(module_name)
+            except BaseException:
+                pass
+
+def run_simulation(code,simulateSB_path,request):
+    #executed in the forked child; never returns
+    try:
+        #new session, such that the simulation can be killed together with its
+        #child processes
+        os.setsid()
+        os.chdir(request['cwd'])
+        devnull = os.open(os.devnull,os.O_RDONLY)
+        os.dup2(devnull,0)
+        for fd,key in ((1,'stdout'),(2,'stderr')):
+            output = os.open(request[key],os.O_WRONLY)
+            os.dup2(output,fd)
+            os.close(output)
+        sys.argv = [simulateSB_path,]+request['argv']
+        returncode = 0
+        try:
+            exec(code,{'__name__':'__main__','__file__':simulateSB_path})
+        except SystemExit as exit:
+            if exit.code is None:
+                returncode = 0
+            elif isinstance(exit.code,int):
+                returncode = exit.code
+            else:
+                print(exit.code,file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except BaseException:
+        traceback.print_exc()
+        returncode = 1
+    os._exit(returncode)
+
+def send(message):
+    sys.stdout.write(json.dumps(message)+'\n')
+    sys.stdout.flush()
+
+
+simulateSB_path = sys.argv[1]
+with open(simulateSB_path,'r') as file:
+    source = file.read()
+code = compile(source,simulateSB_path,'exec')
+#same module search path as when simulateSB.py is run as a script
+sys.path[0] = os.path.dirname(simulateSB_path)
+preload_modules(source=source)
+
+for line in sys.stdin:
+    request = json.loads(line)
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        run_simulation(code=code,simulateSB_path=simulateSB_path,request=request)
+    send({'pid':pid})
+    os.waitid(os.P_PID,pid,os.WEXITED|os.WNOWAIT)
+    send({'exited':True})
+    sys.stdin.readline()
+    _,status,resource_usage = os.wait4(pid,0)
+    send({'returncode':os.waitstatus_to_exitcode(status),
+          'maxrss_kB':resource_usage.ru_maxrss})
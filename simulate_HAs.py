@@ -8,8 +8,8 @@ Created on Tue Jan 16 10:05:21 2024
 
 #usage of this script:
 
-# using project code: 
-# python simulateSB_HAs.py <project code> <SB name> <array config>
+# using project code (several SB names can be given):
+# python simulateSB_HAs.py <project code> <SB name> [<SB name> ...] <array config>
 # --min_HA <min HA> --max_HA <max HA> --HA_step <HA step> --obs_date <YYYY-MM-DD> --writeQueryLog
 
 # using xml (note that the file needs to end in .xml)
@@ -20,6 +20,34 @@ Created on Tue Jan 16 10:05:21 2024
 # python simulateSB_HAs.py <aot filename> <array_config> --min_HA <min HA> 
 # --max_HA <max HA> --HA_step <HA step> --obs_date <YYYY-MM-DD> --writeQueryLog
 
+#in all cases, --jobs <N> can be used to simulate N hour angles in parallel, and
+#several array configs can be given as comma-separated list (e.g. c43-3,c43-4)
+
+#instead of --obs_date, --date_range <start>:<end>:<step in days> simulates all
+#dates of the range (e.g. 2024-10-01:2025-03-31:14)
+
+#HAs where the source is below --min_elevation (default 20 deg), or closer to
+#the Sun than --min_sun_separation (deg, not checked by default), are reported
+#as predicted failures without simulating them, unless --no_prescreen is given
+
+#with --pipeline, the SBs are downloaded, simulated and summarized independently,
+#such that e.g. downloads overlap with simulations (in batches of
+#--download_batch SBs, at most --max_downloads batches at once)
+
+#with --log_archive, the log files are stored in a compressed archive (logs.zip)
+#in the log folder, which can be read with simulate_tools.py
+
+#with --engine persistent, simulateSB.py is run by long-lived worker processes
+#that import its modules only once
+
+#with --plan <manifest>, the simulations are not run but written to a job
+#manifest, to be run by workers (see simulate_tools.py)
+
+#with --dry_run, the simulations are not run, but their CPU time and the
+#makespan with --jobs parallel jobs are estimated from the durations of previous
+#runs (stored in --duration_history, by default
+#~/.cache/simulateSB_HA_wrapper/durations.json)
+
 
 import argparse
 import simulator
@@ -32,7 +60,32 @@ parser.add_argument('--min_HA',type=float,default=None)
 parser.add_argument('--max_HA',type=float,default=None)
 parser.add_argument('--HA_step',type=float,default=1)
 parser.add_argument('--obs_date',type=str,default=None)
+parser.add_argument('--date_range','--date-range',type=str,default=None)
 parser.add_argument('--writeQueryLog',action='store_true')
+parser.add_argument('--xml_max_age',type=float,default=1)
+parser.add_argument('--jobs',type=int,default=1)
+parser.add_argument('--pipeline',action='store_true')
+parser.add_argument('--max_downloads',type=int,default=4)
+parser.add_argument('--download_batch',type=int,default=10)
+parser.add_argument('--resume',action='store_true')
+parser.add_argument('--keep_failed',action='store_true')
+parser.add_argument('--find_window',action='store_true')
+parser.add_argument('--window_resolution',type=float,default=0.05)
+parser.add_argument('--timeout',type=float,default=None)
+parser.add_argument('--fatal_pattern',action='append',default=[])
+parser.add_argument('--profile',action='store_true')
+parser.add_argument('--profile_code',choices=simulator.Profiler.code_profilers,default=None)
+parser.add_argument('--no_cache',action='store_true')
+parser.add_argument('--refresh_cache',action='store_true')
+parser.add_argument('--cache_dir',type=str,default=None)
+parser.add_argument('--plan',type=str,default=None)
+parser.add_argument('--dry_run','--dry-run',action='store_true')
+parser.add_argument('--duration_history',type=str,default=None)
+parser.add_argument('--no_prescreen','--no-prescreen',action='store_true')
+parser.add_argument('--min_elevation',type=float,default=20)
+parser.add_argument('--min_sun_separation',type=float,default=None)
+parser.add_argument('--log_archive',action='store_true')
+parser.add_argument('--engine',choices=['subprocess','persistent'],default='subprocess')
 args = parser.parse_args()
 
 sim = simulator.Simulation(args=args)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Oct 18 11:02:45 2026
+
+Tools to work with the output of simulate_HAs.py
+"""
+
+#usage of this script:
+
+# regenerate the summary file and the available_calibrators.csv files from the
+# results file (<input>_results.jsonl) written by simulate_HAs.py:
+# python simulate_tools.py export <results file> [--summary <summary filename>]
+
+# show over which HAs a calibrator is available or was rejected (and why), using
+# the calibrator index written to the log folder with --writeQueryLog:
+# python simulate_tools.py calibrator <calibrator_index.json> <calibrator> [--type <calibrator type>]
+
+# show the calibrators that most SBs of a project depend on, or over which SBs
+# and HAs a calibrator is available or was rejected, using the project-wide
+# index written with --writeQueryLog (<input>_calibrator_index.json); --matrix
+# writes the calibrator x SB table:
+# python simulate_tools.py project <index file> [<calibrator>] [--type <calibrator type>] [--SB <SB>] [--matrix <csv file>]
+
+# show the simulated calibrator results (SimulatedCalResultsData.dat) of all
+# simulations, stored in <input>_cal_results.npz, optionally only for some SBs,
+# HAs, calibrators etc. (each option can be given several times):
+# python simulate_tools.py cal_results <npz file> [--SB <SB>] [--HA <HA>] [--calibrator <calibrator>]
+# [--array_config <array config>] [--obs_date <date>]
+
+# run one shard of a job manifest written by simulate_HAs.py with --plan; the
+# log files and results are written into the results folder, which can be shared
+# by all workers (e.g. on several nodes, or several processes on one machine):
+# python simulate_tools.py worker <manifest> <results folder> --shard <i>/<n> [--jobs <N>] [--resume] [--keep_failed]
+# [--engine persistent] [--duration_history <file>]
+
+# merge the results of all shards and write the summary file and calibrator CSVs:
+# python simulate_tools.py merge <results folder>
+
+# list the log files in a log archive (written with --log_archive), or print the
+# log files matching the given patterns:
+# python simulate_tools.py logs <log folder>/logs.zip ['HA0.0h_*stderr*' ...]
+
+
+import argparse
+import os
+import sys
+import simulator
+
+parser = argparse.ArgumentParser()
+subparsers = parser.add_subparsers(dest='command',required=True)
+
+export_parser = subparsers.add_parser('export')
+export_parser.add_argument('results_file')
+export_parser.add_argument('--summary',type=str,default=None)
+
+calibrator_parser = subparsers.add_parser('calibrator')
+calibrator_parser.add_argument('index_file')
+calibrator_parser.add_argument('calibrator')
+calibrator_parser.add_argument('--type',type=str,default=None)
+
+project_parser = subparsers.add_parser('project')
+project_parser.add_argument('index_file')
+project_parser.add_argument('calibrator',nargs='?',default=None)
+project_parser.add_argument('--type',type=str,default=None)
+project_parser.add_argument('--SB',type=str,default=None)
+project_parser.add_argument('--matrix',type=str,default=None)
+
+cal_results_parser = subparsers.add_parser('cal_results')
+cal_results_parser.add_argument('npz_file')
+cal_results_parser.add_argument('--SB',action='append',default=None)
+cal_results_parser.add_argument('--HA',type=float,action='append',default=None)
+cal_results_parser.add_argument('--calibrator',action='append',default=None)
+cal_results_parser.add_argument('--array_config',action='append',default=None)
+cal_results_parser.add_argument('--obs_date',action='append',default=None)
+
+worker_parser = subparsers.add_parser('worker')
+worker_parser.add_argument('manifest')
+worker_parser.add_argument('results_folder')
+worker_parser.add_argument('--shard',type=str,default='1/1')
+worker_parser.add_argument('--jobs',type=int,default=1)
+worker_parser.add_argument('--resume',action='store_true')
+worker_parser.add_argument('--keep_failed',action='store_true')
+worker_parser.add_argument('--no_cache',action='store_true')
+worker_parser.add_argument('--cache_dir',type=str,default=None)
+worker_parser.add_argument('--engine',choices=['subprocess','persistent'],
+                           default='subprocess')
+worker_parser.add_argument('--duration_history',type=str,default=None)
+
+merge_parser = subparsers.add_parser('merge')
+merge_parser.add_argument('results_folder')
+
+logs_parser = subparsers.add_parser('logs')
+logs_parser.add_argument('archive')
+logs_parser.add_argument('patterns',nargs='*')
+
+args = parser.parse_args()
+
+if args.command == 'export':
+    store = simulator.ResultsStore(filepath=args.results_file)
+    store.export(summary_filename=args.summary)
+elif args.command == 'calibrator':
+    index = simulator.CalibratorIndex.read(filepath=args.index_file)
+    for line in index.describe(calibrator=args.calibrator,cal_type=args.type):
+        print(line)
+elif args.command == 'project':
+    index = simulator.ProjectCalibratorIndex.read(filepath=args.index_file)
+    if args.calibrator is None:
+        lines = index.describe_usage(cal_type=args.type)
+    else:
+        lines = index.describe(calibrator=args.calibrator,cal_type=args.type,SB=args.SB)
+    for line in lines:
+        print(line)
+    if args.matrix is not None:
+        index.write_matrix(filepath=args.matrix,cal_type=args.type)
+        print(f'wrote {args.matrix}')
+elif args.command == 'cal_results':
+    cal_results = simulator.SimulatedCalResults.read(filepath=args.npz_file)
+    conditions = {column:getattr(args,column) for column
+                  in ('SB','HA','calibrator','array_config','obs_date')
+                  if getattr(args,column) is not None}
+    selected = cal_results.select(**conditions)
+    print('\t'.join(selected.columns))
+    for row in zip(*selected.columns.values()):
+        print('\t'.join(str(value) for value in row))
+    print(f'{len(selected)} of {len(cal_results)} rows')
+elif args.command == 'worker':
+    manifest = simulator.JobManifest.read(filepath=args.manifest)
+    cache = None if args.no_cache else simulator.SimulationCache(folder=args.cache_dir)
+    engine = simulator.PersistentEngine() if args.engine == 'persistent' else None
+    duration_history = simulator.DurationHistory(filepath=args.duration_history)
+    worker = simulator.ShardWorker(manifest=manifest,shard=args.shard,n_jobs=args.jobs,
+                                   cache=cache,engine=engine,resume=args.resume,
+                                   duration_history=duration_history,
+                                   keep_failed=args.keep_failed)
+    os.makedirs(args.results_folder,exist_ok=True)
+    os.chdir(args.results_folder)
+    worker.run()
+elif args.command == 'merge':
+    os.chdir(args.results_folder)
+    results_files = simulator.ShardWorker.get_results_files()
+    if len(results_files) == 0:
+        raise RuntimeError(f'no results of shards found in {args.results_folder}')
+    print(f'merging {", ".join(results_files)}')
+    store = simulator.ResultsStore.merge(filepaths=results_files,
+                                         filepath='merged_results.jsonl')
+    store.export()
+elif args.command == 'logs':
+    archive = simulator.LogArchive(filepath=args.archive)
+    if len(args.patterns) == 0:
+        for name in archive.get_names():
+            print(name)
+    else:
+        names = archive.find(patterns=args.patterns)
+        if len(names) == 0:
+            sys.exit(f'no log files matching {" ".join(args.patterns)} in {args.archive}')
+        for name in names:
+            if len(names) > 1:
+                print(f'==> {name} <==')
+            print(archive.read(name=name),end='')
@@ -6,15 +6,33 @@ Created on Tue Jul 15 14:41:43 2025
 @author: gianni
 """
 
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import datetime
+import fnmatch
+import functools
+import hashlib
+import heapq
 import itertools
+import json
 import os
+import queue
+import re
+import shlex
 import shutil
+import signal
 import sys
 import glob
 import subprocess
+import tempfile
+import threading
+import time
+import types
+import zipfile
 import xml.etree.ElementTree as ET
-from astropy.coordinates import SkyCoord
-from astropy import units as u
 from pathlib import Path
 
 
@@ -34,12 +52,204 @@ def ask_question_exit_if_answer_no(question):
     if not proceed:
         sys.exit("exiting")
 
+def kill_process_group(process):
+    try:
+        os.killpg(process.pid,signal.SIGKILL)
+    except ProcessLookupError:
+        #already finished
+        pass
+
+def wait_for_process(process,on_exit=None):
+    """Waits for the process to finish. on_exit is called when the process has
+    exited but is not reaped yet, i.e. while its pid cannot be reused. The
+    process is then reaped with os.wait4 to get its resource usage, which is
+    returned."""
+    os.waitid(os.P_PID,process.pid,os.WEXITED|os.WNOWAIT)
+    if on_exit is not None:
+        on_exit()
+    _,status,resource_usage = os.wait4(process.pid,0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return resource_usage
+
+def get_simulation_label(xml_filename,array_config=None,obs_date=None):
+    #array config and obs date are only added if several were simulated
+    details = [d for d in (array_config,obs_date) if d is not None]
+    if len(details) == 0:
+        return xml_filename
+    return f'{xml_filename} ({", ".join(details)})'
+
+def write_HA_table(filename,row_name,rows):
+    """Writes a table with one row per entry of rows (e.g. array configurations
+    or observation dates) and one column per HA. rows contains, for each row, a
+    dict {HA: cell content}."""
+    HAs = sorted(set(HA for row in rows.values() for HA in row))
+    with open(filename,'w',newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow([row_name,]+HAs)
+        for row_label,row in rows.items():
+            writer.writerow([row_label,]+[row.get(HA,'') for HA in HAs])
+
+def write_config_HA_matrix(filename,rows):
+    """Writes a table with one row per array configuration and one column per
+    HA, containing the status of each simulation and the available calibrators.
+    rows contains, for each configuration, a list of (HA,status,available
+    calibrators) tuples."""
+    table = {}
+    for array_config,row in rows.items():
+        table[array_config] = {}
+        for HA,status,available_calibrators in row:
+            cell = [status,]
+            for cal_type,calibrators in (available_calibrators or {}).items():
+                cell.append(f'{cal_type}: {";".join(calibrators) or "None"}')
+            table[array_config][HA] = ' | '.join(cell)
+    write_HA_table(filename=filename,row_name='config',rows=table)
+
+def get_config_HA_matrix_filename(obs_date=None):
+    #with several observation dates, there is one matrix per date
+    if obs_date is None:
+        return 'config_HA_matrix.csv'
+    return f'config_HA_matrix_{obs_date}.csv'
+
+def write_date_HA_grids(folder,rows):
+    """Writes date x HA tables into folder: date_HA_status.csv with the status of
+    each simulation, and date_HA_<calibrator type>.csv for each calibrator type,
+    with the available calibrators. rows contains, for each observation date, a
+    list of (HA,status,available calibrators) tuples. Returns the filenames."""
+    status_table = {}
+    calibrator_tables = collections.defaultdict(dict)
+    for obs_date,row in rows.items():
+        status_table[obs_date] = {}
+        for HA,status,available_calibrators in row:
+            status_table[obs_date][HA] = status
+            for cal_type,calibrators in (available_calibrators or {}).items():
+                calibrator_tables[cal_type].setdefault(obs_date,{})[HA] =\
+                                                  ';'.join(calibrators) or 'None'
+    filenames = [os.path.join(folder,'date_HA_status.csv'),]
+    write_HA_table(filename=filenames[0],row_name='date',rows=status_table)
+    for cal_type,table in calibrator_tables.items():
+        filenames.append(os.path.join(folder,f'date_HA_{cal_type}.csv'))
+        write_HA_table(filename=filenames[-1],row_name='date',rows=table)
+    return filenames
+
+def estimate_makespan(durations,n_workers):
+    #longest jobs first, each to the worker that becomes free first (as done
+    #by the job queue)
+    workers = [0,]*n_workers
+    for duration in sorted(durations,reverse=True):
+        heapq.heapreplace(workers,workers[0]+duration)
+    return max(workers)
+
+def format_duration(seconds):
+    if seconds < 60:
+        return f'{seconds:.1f}s'
+    if seconds < 3600:
+        return f'{seconds/60:.1f}min'
+    return f'{seconds/3600:.1f}h'
+
+def run_in_parallel(function,arguments,n_jobs):
+    #returns the outputs in the order of the arguments, whatever order the
+    #calls finish in
+    if n_jobs == 1:
+        return [function(arg) for arg in arguments]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        return list(executor.map(function,arguments))
+
+
+class Coordinates():
+    """Lightweight RA/Dec record (in deg). astropy is only imported when a SkyCoord
+    is actually needed, since importing it is slow."""
+
+    __slots__ = ('ra_deg','dec_deg')
+
+    def __init__(self,ra_deg,dec_deg):
+        self.ra_deg = ra_deg
+        self.dec_deg = dec_deg
+
+    def __repr__(self):
+        return f'Coordinates(ra_deg={self.ra_deg},dec_deg={self.dec_deg})'
+
+    def to_SkyCoord(self):
+        from astropy.coordinates import SkyCoord
+        from astropy import units as u
+        return SkyCoord(ra=self.ra_deg*u.deg,dec=self.dec_deg*u.deg)
+
+
+class Prescreen():
+    """Predicts simulations that fail for geometric reasons alone (source below
+    the elevation limit at the ALMA site, or too close to the Sun), from the
+    representative coordinates of the SB, for all HAs at once. Such
+    simulations do not need to be run."""
+
+    ALMA_latitude_deg = -23.0293
+    ALMA_longitude_deg = -67.7548
+
+    def __init__(self,min_elevation_deg=20,min_sun_separation_deg=None):
+        self.min_elevation_deg = min_elevation_deg
+        #the Sun is only checked if a minimum separation is given
+        self.min_sun_separation_deg = min_sun_separation_deg
+
+    @classmethod
+    def get_elevations(cls,dec_deg,HAs):
+        #elevation (deg) of a source with declination dec_deg at the hour
+        #angles HAs (h)
+        import numpy as np
+        latitude = np.radians(cls.ALMA_latitude_deg)
+        dec = np.radians(dec_deg)
+        HA = np.radians(np.asarray(HAs,dtype=float)*15)
+        sin_elevation = np.sin(latitude)*np.sin(dec)\
+                         + np.cos(latitude)*np.cos(dec)*np.cos(HA)
+        return np.degrees(np.arcsin(np.clip(sin_elevation,-1,1)))
+
+    @classmethod
+    def get_sun_separations(cls,coordinates,HAs,obs_date):
+        #separation (deg) between the source and the Sun at the hour angles HAs
+        #(h) on obs_date (today if None)
+        import numpy as np
+        from astropy.time import Time
+        from astropy.coordinates import get_sun
+        from astropy import units as u
+        if obs_date is None:
+            obs_date = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        start_of_day = Time(obs_date,scale='utc')
+        LST_start_of_day = start_of_day.sidereal_time(
+                              'mean',longitude=cls.ALMA_longitude_deg*u.deg).hour
+        #time after the start of the day where LST = RA + HA
+        sidereal_hours = (coordinates.ra_deg/15+np.asarray(HAs,dtype=float)
+                          -LST_start_of_day) % 24
+        times = start_of_day + sidereal_hours/1.0027379*u.hour
+        sun = get_sun(times)
+        #the source is transformed into the (geocentric) frame of the Sun, not
+        #the other way around
+        source = coordinates.to_SkyCoord().transform_to(sun.frame)
+        return sun.separation(source).deg
+
+    def predict_failures(self,coordinates,HAs,obs_date):
+        """Returns, for each HA, the reason why the simulation will fail, or None
+        if it needs to be simulated."""
+        elevations = self.get_elevations(dec_deg=coordinates.dec_deg,HAs=HAs)
+        reasons = [None,]*len(HAs)
+        if self.min_sun_separation_deg is not None:
+            sun_separations = self.get_sun_separations(coordinates=coordinates,HAs=HAs,
+                                                       obs_date=obs_date)
+            for i,separation in enumerate(sun_separations):
+                if separation < self.min_sun_separation_deg:
+                    reasons[i] = f'source {separation:.1f} deg from the Sun (limit'\
+                                 +f' {self.min_sun_separation_deg} deg)'
+        for i,elevation in enumerate(elevations):
+            if elevation < self.min_elevation_deg:
+                reasons[i] = f'source elevation {elevation:.1f} deg (limit'\
+                             +f' {self.min_elevation_deg} deg)'
+        return reasons
+
 
 class OT_XML_File():
     namespaces = {'sbl':'Alma/ObsPrep/SchedBlock',
                   'prj':"Alma/ObsPrep/ObsProject",
                   'val':"Alma/ValueTypes"}
     long_lat_keys = {'longitude':'ra','latitude':'dec'}
+    getsb_output_separator = '#### end of getsb.py output ####'
+    xml_cache_folder = os.path.join(os.path.expanduser('~'),'.cache',
+                                    'simulateSB_HA_wrapper','xml')
 
     def __init__(self,filepath,xml_str=None):
         if filepath is not None:
@@ -50,8 +260,14 @@ class OT_XML_File():
             self.root = ET.fromstring(xml_str)
 
     @staticmethod
-    def download_xml_str(project_code,SB):
+    def get_getsb_command():
+        """Returns the shell command to run getsb.py, and the server where it
+        needs to be executed (None if it can be run locally)."""
         #I took this code directly from simulateSB.py and simplified it
+        fake_scriptGetSB = os.getenv('GETSB_SCRIPT')
+        if fake_scriptGetSB is not None:
+            #a local replacement of getsb.py, e.g. for testing
+            return fake_scriptGetSB,None
         scriptGetSB = "/groups/science/scripts/P2G/getsb/getsb.py"
         if not os.path.isfile(scriptGetSB):
             scriptGetSB = "/users/ahirota/AIV/science/scripts/P2G/getsb/getsb.py"
@@ -63,38 +279,95 @@ class OT_XML_File():
                   " on red-osf")
             serverName = "red-osf.osf.alma.cl"
         if serverName:
-            userName = os.getenv("USER")
-            cmd = ["ssh"]
-            cmd.append(f"{userName}@{serverName}")
             scriptName = "PYTHONPATH=/users/ahirota/local/lib64/python2.6/"\
                           +"site-packages/cx_Oracle-5.2.1-py2.6-linux-x86_64.egg"\
                           +f":$PYTHONPATH {scriptGetSB}"
-            cmd.append(f"{scriptName} -p '{project_code}' -s '{SB}'")
-            cmd.append("-S ora.sco.alma.cl:1521/ONLINE.SCO.CL")
+            return scriptName,serverName
+        return scriptGetSB,None
+
+    @classmethod
+    def download_xml_strs(cls,project_code,SBs):
+        """Downloads the xmls of several SBs of a project with a single invocation
+        (i.e. a single ssh connection if getsb.py needs to run on red-osf). Returns
+        a dict with the xml string of each SB."""
+        scriptGetSB,serverName = cls.get_getsb_command()
+        getsb_commands = []
+        for SB in SBs:
+            getsb_commands.append(f"{scriptGetSB} -p {shlex.quote(project_code)}"
+                                  +f" -s {shlex.quote(SB)}"
+                                  +" -S ora.sco.alma.cl:1521/ONLINE.SCO.CL")
+            #the separator allows to split the output into the individual xmls
+            getsb_commands.append(f"echo '{cls.getsb_output_separator}'")
+        script = "; ".join(getsb_commands)
+        if serverName:
+            userName = os.getenv("USER")
+            cmd = ["ssh",f"{userName}@{serverName}",script]
         else:
-            cmd = [scriptGetSB]
-            cmd.extend(["-p", project_code, "-s", SB])
-            cmd.extend(["-S", "ora.sco.alma.cl:1521/ONLINE.SCO.CL"])
-        print("# Retrieving SB xml with the following command [%s]"\
+            cmd = ["sh","-c",script]
+        print("# Retrieving SB xml(s) with the following command [%s]"\
                       % (" ".join(cmd)))
         p = subprocess.Popen(cmd,stdout=subprocess.PIPE,env=None)
-        xml_str, _ = p.communicate()
-        if hasattr(sys.stdout,"detach"):
-            # Py3
-            xml_str = xml_str.decode("utf-8")
-        return xml_str
+        output, _ = p.communicate()
+        output = output.decode("utf-8")
+        xml_strs = output.split(f'{cls.getsb_output_separator}\n')[:len(SBs)]
+        if len(xml_strs) < len(SBs) or any(x.strip() == '' for x in xml_strs):
+            raise RuntimeError(f'failed to retrieve xml(s) of {project_code}, {SBs}')
+        return dict(zip(SBs,xml_strs))
 
-    @staticmethod
-    def download_xml_file(project_code,SB,filename=None):
-        xml_str = OT_XML_File.download_xml_str(project_code=project_code,SB=SB)
-        if filename is None:
-            filename = f'{SB}.xml'
-        if os.path.exists(filename):
-            raise RuntimeError(f'error downloading {filename}, already'
-                               +' exists; please delete')
-        with open(filename,"w") as file:
+    @classmethod
+    def download_xml_str(cls,project_code,SB):
+        return cls.download_xml_strs(project_code=project_code,SBs=[SB])[SB]
+
+    @classmethod
+    def get_cached_xml_filepath(cls,project_code,SB):
+        return os.path.join(cls.xml_cache_folder,project_code,f'{SB}.xml')
+
+    @classmethod
+    def read_cached_xml_str(cls,project_code,SB,max_age_hours):
+        """Returns the locally cached xml string of the SB, or None if it is not
+        cached or older than max_age_hours."""
+        filepath = cls.get_cached_xml_filepath(project_code=project_code,SB=SB)
+        try:
+            age = datetime.datetime.now().timestamp()-os.path.getmtime(filepath)
+            if age > max_age_hours*3600:
+                return None
+            with open(filepath,'r') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    @classmethod
+    def write_cached_xml_str(cls,project_code,SB,xml_str):
+        filepath = cls.get_cached_xml_filepath(project_code=project_code,SB=SB)
+        os.makedirs(os.path.dirname(filepath),exist_ok=True)
+        #write to a temporary file first, such that concurrent runs never read
+        #incomplete files
+        tmp_filepath = f'{filepath}.{os.getpid()}.tmp'
+        with open(tmp_filepath,'w') as file:
             file.write(xml_str)
-        return filename
+        os.replace(tmp_filepath,filepath)
+
+    @classmethod
+    def retrieve_xml_strs(cls,project_code,SBs,max_age_hours=1):
+        """Returns a dict with the xml strings of the SBs. Uses the local xml
+        cache for SBs that were downloaded less than max_age_hours ago, and
+        downloads the other SBs in a single batch."""
+        xml_strs = {}
+        for SB in SBs:
+            xml_str = cls.read_cached_xml_str(project_code=project_code,SB=SB,
+                                              max_age_hours=max_age_hours)
+            if xml_str is not None:
+                print(f'using cached xml of {SB}')
+                xml_strs[SB] = xml_str
+        SBs_to_download = [SB for SB in SBs if SB not in xml_strs]
+        if len(SBs_to_download) > 0:
+            downloaded = cls.download_xml_strs(project_code=project_code,
+                                               SBs=SBs_to_download)
+            for SB,xml_str in downloaded.items():
+                cls.write_cached_xml_str(project_code=project_code,SB=SB,
+                                         xml_str=xml_str)
+            xml_strs.update(downloaded)
+        return xml_strs
 
     @classmethod
     def from_download(cls,project_code,SB):
@@ -113,7 +386,7 @@ class OT_XML_File():
             element = coord_data.find(f'val:{xml_key}',namespaces=self.namespaces)
             assert element.attrib['unit'] == 'deg'
             coord[output_key] = float(element.text)
-        return SkyCoord(ra=coord['ra']*u.deg,dec=coord['dec']*u.deg)
+        return Coordinates(ra_deg=coord['ra'],dec_deg=coord['dec'])
 
     def get_representative_coordinates(self):
         tag = 'sbl:SchedulingConstraints/sbl:representativeCoordinates'
@@ -131,6 +404,12 @@ class OT_XML_File():
                                      namespaces=self.namespaces)
          return [c.text for c in configs]
 
+    def read_receiver_bands(self):
+        #e.g. 'ALMA_RB_03', or several bands separated by '+'
+        bands = {element.attrib['receiverBand'] for element in self.root.iter()
+                 if 'receiverBand' in element.attrib}
+        return '+'.join(sorted(bands)) if len(bands) > 0 else 'unknown'
+
     def read_RequiresTPAntennas(self):
         text = self.root.findtext('sbl:SchedulingConstraints/sbl:sbRequiresTPAntennas',
                                   namespaces=self.namespaces)
@@ -144,24 +423,1071 @@ class OT_XML_File():
             raise RuntimeError(f'unknown xml content for sbRequiresTPAntennas: {text}')
 
 
+class SimulationCache():
+    """On-disk cache of simulateSB.py results. Each entry is a folder named by
+    a hash of all inputs of the simulation, containing the result and the log
+    files of that simulation."""
+
+    default_folder = os.path.join(os.path.expanduser('~'),'.cache',
+                                  'simulateSB_HA_wrapper','simulations')
+    result_filename = 'result.json'
+    #increase if the content of the entries changes:
+    format_version = 3
+
+    def __init__(self,folder=None,refresh=False,max_size_MB=2000,max_age_days=30):
+        #absolute, since the shard workers change their working directory
+        self.folder = os.path.abspath(self.default_folder if folder is None else folder)
+        self.refresh = refresh
+        self.max_size_MB = max_size_MB
+        self.max_age_days = max_age_days
+        os.makedirs(self.folder,exist_ok=True)
+        self.simulateSB_fingerprint = self.get_simulateSB_fingerprint()
+        self.evict()
+
+    @staticmethod
+    def get_simulateSB_fingerprint():
+        #identifies the simulateSB.py version and the environment it runs in
+        #(as set up by setupEnvCXY.sh)
+        simulateSB_path = shutil.which('simulateSB.py')
+        if simulateSB_path is None:
+            return 'simulateSB.py not found'
+        simulateSB_path = os.path.realpath(simulateSB_path)
+        stat = os.stat(simulateSB_path)
+        return ':'.join([simulateSB_path,str(stat.st_size),str(stat.st_mtime_ns),
+                         os.getenv('PYTHONPATH',''),sys.version])
+
+    def get_key(self,xml_file,epoch,array_config,writeQueryLog,array_config_file=None):
+        key_hash = hashlib.sha256()
+        with open(xml_file,'rb') as file:
+            key_hash.update(file.read())
+        if array_config_file is not None:
+            #configuration file, so the content matters
+            with open(array_config_file,'rb') as file:
+                key_hash.update(file.read())
+        for item in (epoch,array_config,str(writeQueryLog),self.simulateSB_fingerprint,
+                     str(self.format_version)):
+            key_hash.update(b'\0'+item.encode('utf-8'))
+        return key_hash.hexdigest()
+
+    def get_entry_folder(self,key):
+        return os.path.join(self.folder,key)
+
+    def load(self,key,work_dir):
+        """Returns the cached output and copies the cached log files into work_dir,
+        or returns None if the simulation is not cached."""
+        if self.refresh:
+            return None
+        entry_folder = self.get_entry_folder(key=key)
+        result_filepath = os.path.join(entry_folder,self.result_filename)
+        try:
+            with open(result_filepath,'r') as file:
+                entry = json.load(file)
+            for log_filename in entry['log_files']:
+                shutil.copy(os.path.join(entry_folder,log_filename),work_dir)
+        except (OSError,ValueError,KeyError):
+            return None
+        #mark as recently used, which is taken into account for eviction
+        os.utime(result_filepath)
+        return entry['output']
+
+    def store(self,key,output,log_files):
+        #write to a temporary folder first, such that incomplete entries are
+        #never visible
+        tmp_folder = tempfile.mkdtemp(prefix='.tmp_',dir=self.folder)
+        for log_f in log_files:
+            shutil.copy(log_f,tmp_folder)
+        entry = {'output':output,
+                 'log_files':[os.path.basename(log_f) for log_f in log_files]}
+        with open(os.path.join(tmp_folder,self.result_filename),'w') as file:
+            json.dump(entry,file)
+        entry_folder = self.get_entry_folder(key=key)
+        if os.path.isdir(entry_folder):
+            shutil.rmtree(entry_folder)
+        try:
+            os.rename(tmp_folder,entry_folder)
+        except OSError:
+            #another process stored the same entry in the meantime
+            shutil.rmtree(tmp_folder)
+
+    @staticmethod
+    def get_folder_size(folder):
+        return sum(entry.stat().st_size for entry in os.scandir(folder)
+                   if entry.is_file())
+
+    def evict(self):
+        """Deletes entries that are older than max_age_days, then deletes the
+        least recently used entries until the cache is smaller than max_size_MB."""
+        entries = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_dir():
+                continue
+            try:
+                last_used = os.path.getmtime(os.path.join(entry.path,self.result_filename))
+            except OSError:
+                #incomplete entry
+                last_used = entry.stat().st_mtime
+            entries.append((last_used,entry.path))
+        entries.sort()
+        min_last_used = datetime.datetime.now().timestamp()-self.max_age_days*86400
+        total_size = sum(self.get_folder_size(path) for _,path in entries)
+        for last_used,path in entries:
+            if last_used >= min_last_used and total_size <= self.max_size_MB*1e6:
+                break
+            total_size -= self.get_folder_size(path)
+            shutil.rmtree(path,ignore_errors=True)
+
+
+class DurationHistory():
+    """Durations of previous executions of simulateSB.py, by SB mode, array
+    configuration and receiver band, used to estimate the runtime of new
+    simulations. Stored as {key:[number of simulations,total duration in s]}."""
+
+    default_filepath = os.path.join(os.path.expanduser('~'),'.cache',
+                                    'simulateSB_HA_wrapper','durations.json')
+    #keys used to estimate a duration, from the most to the least specific:
+    estimate_levels = {'same mode, configuration and band':(0,1,2),
+                       'same mode and band':(0,2),'same mode':(0,),
+                       'all previous simulations':()}
+
+    def __init__(self,filepath=None):
+        #absolute, since the worker changes into the results folder
+        self.filepath = os.path.abspath(self.default_filepath if filepath is None
+                                        else filepath)
+        self.lock = threading.Lock()
+        #the estimates only use the durations of previous runs, such that they
+        #do not change during a run (see SBSimulation.expected_cost)
+        self.durations = self.read_file()
+        #durations added by this run, to be written into the file:
+        self.new_durations = {}
+
+    @staticmethod
+    def get_key(modeName,array_config,band):
+        return '|'.join([modeName,os.path.basename(array_config),band])
+
+    def read_file(self):
+        try:
+            with open(self.filepath,'r') as file:
+                return json.load(file)
+        except (OSError,ValueError):
+            return {}
+
+    @staticmethod
+    def add_to(durations,key,n,total):
+        previous_n,previous_total = durations.get(key,[0,0])
+        durations[key] = [previous_n+n,previous_total+total]
+
+    def add(self,key,duration):
+        with self.lock:
+            self.add_to(durations=self.new_durations,key=key,n=1,total=duration)
+
+    def estimate(self,key):
+        """Returns the mean duration (in s) of the previous simulations with the
+        most specific matching key (see estimate_levels), and a description of
+        the match. Returns (None,None) if there are no previous simulations."""
+        key_fields = key.split('|')
+        for description,indices in self.estimate_levels.items():
+            n,total = 0,0
+            with self.lock:
+                for other_key,(other_n,other_total) in self.durations.items():
+                    other_fields = other_key.split('|')
+                    if all(other_fields[i] == key_fields[i] for i in indices):
+                        n += other_n
+                        total += other_total
+            if n > 0:
+                return total/n,description
+        return None,None
+
+    def write(self):
+        with self.lock:
+            if len(self.new_durations) == 0:
+                return
+            #other runs may have written durations in the meantime
+            durations = self.read_file()
+            for key,(n,total) in self.new_durations.items():
+                self.add_to(durations=durations,key=key,n=n,total=total)
+            os.makedirs(os.path.dirname(self.filepath),exist_ok=True)
+            tmp_filepath = f'{self.filepath}.tmp{os.getpid()}'
+            with open(tmp_filepath,'w') as file:
+                json.dump(durations,file,indent=1)
+            os.replace(tmp_filepath,self.filepath)
+            self.new_durations = {}
+
+
+class Profiler():
+    """Collects the time spent in the different phases of the wrapper, counters,
+    and metrics of each execution of simulateSB.py. Optionally, the wrapper's
+    own code can be profiled with cProfile or pyinstrument."""
+
+    code_profilers = ('cprofile','pyinstrument')
+
+    def __init__(self,code_profiler=None):
+        assert code_profiler is None or code_profiler in self.code_profilers
+        self.code_profiler = code_profiler
+        self.phase_durations = collections.defaultdict(float)
+        self.counters = collections.Counter()
+        self.simulations = []
+        self.lock = threading.Lock()
+
+    def add_time(self,phase,duration):
+        with self.lock:
+            self.phase_durations[phase] += duration
+            self.counters[phase] += 1
+
+    @contextlib.contextmanager
+    def phase(self,name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase=name,duration=time.perf_counter()-start_time)
+
+    def count(self,name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def add_simulation(self,**metrics):
+        with self.lock:
+            self.simulations.append(metrics)
+
+    @contextlib.contextmanager
+    def code_profiling(self,output_prefix):
+        """Profiles the code executed within the context, writing the profile to
+        a file starting with output_prefix. cProfile profiles the current thread
+        and all threads started within the context (e.g. the parallel jobs and
+        the threads streaming the output), pyinstrument only the current
+        thread."""
+        if self.code_profiler is None:
+            yield
+        elif self.code_profiler == 'cprofile':
+            import cProfile
+            import pstats
+            profiles = [cProfile.Profile(),]
+            profiles_lock = threading.Lock()
+            #up to python 3.11, a profile only sees the thread that enabled it,
+            #so each new thread enables its own one; from 3.12 on, cProfile is
+            #based on sys.monitoring, which allows only one active profile, but
+            #that one sees all threads
+            profile_per_thread = sys.version_info < (3,12)
+            def profile_thread(frame,event,arg):
+                #called for the first event of each new thread; enabling the
+                #profile replaces this function for the rest of the thread
+                profile = cProfile.Profile()
+                with profiles_lock:
+                    profiles.append(profile)
+                profile.enable()
+            if profile_per_thread:
+                threading.setprofile(profile_thread)
+            profiles[0].enable()
+            try:
+                yield
+            finally:
+                profiles[0].disable()
+                if profile_per_thread:
+                    threading.setprofile(None)
+                #the threads started within the context are finished at this
+                #point, so their profiles are complete
+                with profiles_lock:
+                    stats = pstats.Stats(*profiles)
+                stats.dump_stats(f'{output_prefix}_cprofile.prof')
+                print(f'cProfile output written to {output_prefix}_cprofile.prof')
+        else:
+            import pyinstrument
+            profile = pyinstrument.Profiler()
+            profile.start()
+            try:
+                yield
+            finally:
+                profile.stop()
+                with open(f'{output_prefix}_pyinstrument.html','w') as file:
+                    file.write(profile.output_html())
+                print(f'pyinstrument output written to {output_prefix}_pyinstrument.html')
+
+    def get_report_lines(self):
+        lines = [f'{"phase":<32}{"count":>8}{"total [s]":>12}{"mean [s]":>12}']
+        for phase,duration in self.phase_durations.items():
+            count = self.counters[phase]
+            lines.append(f'{phase:<32}{count:>8}{duration:>12.3f}{duration/count:>12.3f}')
+        for name,count in self.counters.items():
+            if name not in self.phase_durations:
+                lines.append(f'{name:<32}{count:>8}')
+        if len(self.simulations) > 0:
+            durations = [s['duration'] for s in self.simulations]
+            peak_rss = [s['peak_rss_MB'] for s in self.simulations
+                        if s['peak_rss_MB'] is not None]
+            lines.append(f'simulateSB.py executions: {len(self.simulations)}, duration'
+                         +f' min/mean/max: {min(durations):.2f}/'
+                         +f'{sum(durations)/len(durations):.2f}/{max(durations):.2f}s')
+            if len(peak_rss) > 0:
+                lines.append(f'max peak RSS of simulateSB.py: {max(peak_rss):.1f} MB')
+            output_MB = sum(s['output_MB'] for s in self.simulations)
+            lines.append(f'total output (stdout+stderr) of simulateSB.py: {output_MB:.2f} MB')
+        return lines
+
+    def write(self,filepath):
+        with open(filepath,'w') as file:
+            json.dump({'phases':{phase:{'total_s':duration,'count':self.counters[phase]}
+                                 for phase,duration in self.phase_durations.items()},
+                       'counters':{name:count for name,count in self.counters.items()
+                                   if name not in self.phase_durations},
+                       'simulations':self.simulations},file,indent=1)
+
+
+class ResultsStore():
+    """Results of the simulations, stored as a JSON lines file with one record
+    per simulation. Records are appended as soon as a simulation is done, so
+    the results survive a crash, and the file is never rewritten."""
+
+    def __init__(self,filepath):
+        self.filepath = filepath
+        self.lock = threading.Lock()
+
+    def append(self,record):
+        line = json.dumps(record)+'\n'
+        with self.lock:
+            with open(self.filepath,'a') as file:
+                file.write(line)
+                file.flush()
+                os.fsync(file.fileno())
+
+    def read(self):
+        with open(self.filepath,'r') as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    #incomplete last line after a crash
+                    continue
+
+    @classmethod
+    def merge(cls,filepaths,filepath):
+        """Concatenates the records of several results files (e.g. written by
+        the workers of a sharded run) into a new results file."""
+        with open(filepath,'w') as merged_file:
+            for path in filepaths:
+                with open(path,'r') as file:
+                    for line in file:
+                        if line.strip() != '':
+                            merged_file.write(line.rstrip('\n')+'\n')
+        return cls(filepath=filepath)
+
+    def get_latest_records(self):
+        """Returns the records grouped by (xml file,array configuration,obs date),
+        sorted by name, with the records of each group sorted by HA. If a HA was
+        simulated several times, only the latest record is kept."""
+        records = {}
+        for record in self.read():
+            key = (record['xml_file'],record['array_config'],record['obs_date'])
+            records.setdefault(key,{})[record['HA']] = record
+        #obs_date is None if no date was specified
+        sorted_keys = sorted(records,key=lambda k: (k[0],k[1],k[2] or ''))
+        return {key:[records[key][HA] for HA in sorted(records[key])]
+                for key in sorted_keys}
+
+    def get_journal(self):
+        #latest records by (xml file,array configuration,obs date) and HA, used
+        #to resume a run
+        return {key:{record['HA']:record for record in records}
+                for key,records in self.get_latest_records().items()}
+
+    def export(self,summary_filename=None):
+        """Regenerates the summary file, the available_calibrators.csv,
+        calibrator_index.json, config_HA_matrix.csv and date_HA_*.csv files (in
+        the log folders), the project calibrator index and the consolidated
+        calibrator results (.npz) from the stored records."""
+        if summary_filename is None:
+            summary_filename = self.filepath.replace('_results.jsonl','')\
+                                  +'_simulation_summary.txt'
+        latest_records = self.get_latest_records()
+        array_configs = collections.defaultdict(set)
+        obs_dates = collections.defaultdict(set)
+        for xml_file,array_config,obs_date in latest_records:
+            array_configs[xml_file].add(array_config)
+            obs_dates[xml_file].add(obs_date)
+        config_HA_matrices = collections.defaultdict(dict)
+        date_HA_grids = collections.defaultdict(dict)
+        project_index = ProjectCalibratorIndex()
+        cal_results = []
+        with open(summary_filename,'w') as summary_file:
+            for (xml_file,array_config,obs_date),records in latest_records.items():
+                several_configs = len(array_configs[xml_file]) > 1
+                several_dates = len(obs_dates[xml_file]) > 1
+                HAs = [r['HA'] for r in records]
+                label = get_simulation_label(
+                           xml_filename=xml_file,
+                           array_config=array_config if several_configs else None,
+                           obs_date=obs_date if several_dates else None)
+                summary_file.write(f'\n{label}\n')
+                for line in SBSimulation.get_results_lines(
+                                     HAs=HAs,results=[r['result'] for r in records]):
+                    summary_file.write(line+'\n')
+                log_folder = records[-1].get('log_folder',
+                                             f'log_files_{Path(xml_file).stem}')
+                HA_table_row = [(r['HA'],r['status'],r['available_calibrators'])
+                                for r in records]
+                cal_results += [(r['SB'],array_config,obs_date,r['HA'],r['cal_results'])
+                                for r in records if r.get('cal_results') is not None]
+                #the log folder is <SB folder>[/<config>][/<date>]
+                config_folder = os.path.dirname(log_folder) if several_dates\
+                                                            else log_folder
+                if several_dates:
+                    date_HA_grids[config_folder][obs_date] = HA_table_row
+                if several_configs:
+                    SB_folder = os.path.dirname(config_folder)
+                    config_HA_matrices[(SB_folder,obs_date if several_dates else None)]\
+                                                    [array_config] = HA_table_row
+                if all(r['writeQueryLog'] for r in records):
+                    os.makedirs(log_folder,exist_ok=True)
+                    csv_filename = os.path.join(log_folder,'available_calibrators.csv')
+                    SBSimulation.write_available_calibrators_csv(
+                          out_filename=csv_filename,HAs=HAs,
+                          available_calibrators=[r['available_calibrators'] for r
+                                                 in records])
+                    print(f'wrote {csv_filename}')
+                    index = CalibratorIndex()
+                    for r in records:
+                        index.add_query_results(
+                                HA=r['HA'],available_calibrators=r['available_calibrators'],
+                                rejected_calibrators=r['rejected_calibrators'])
+                    index.write(filepath=os.path.join(log_folder,'calibrator_index.json'))
+                    project_index.add_simulation(
+                        SB=xml_file,array_config=array_config,obs_date=obs_date,HAs=HAs,
+                        available_calibrators=[r['available_calibrators'] for r in records],
+                        rejected_calibrators=[r['rejected_calibrators'] for r in records])
+        print(f'wrote {summary_filename}')
+        if len(project_index.SBs) > 0:
+            prefix = self.filepath.replace('_results.jsonl','')
+            project_index.write(filepath=f'{prefix}_calibrator_index.json')
+            project_index.write_matrix(filepath=f'{prefix}_calibrator_matrix.csv')
+            print(f'wrote {prefix}_calibrator_index.json and {prefix}_calibrator_matrix.csv')
+        if len(cal_results) > 0:
+            cal_results_filename = self.filepath.replace('_results.jsonl','')\
+                                      +'_cal_results.npz'
+            SimulatedCalResults.from_results(results=cal_results).write(
+                                                      filepath=cal_results_filename)
+            print(f'wrote {cal_results_filename}')
+        for (SB_folder,obs_date),rows in config_HA_matrices.items():
+            matrix_filename = os.path.join(
+                      SB_folder,get_config_HA_matrix_filename(obs_date=obs_date))
+            write_config_HA_matrix(filename=matrix_filename,rows=rows)
+            print(f'wrote {matrix_filename}')
+        for config_folder,rows in date_HA_grids.items():
+            for filename in write_date_HA_grids(folder=config_folder,rows=rows):
+                print(f'wrote {filename}')
+
+
+class SimulatedCalResults():
+    """Contents of the SimulatedCalResultsData.dat files written by simulateSB.py,
+    consolidated over all simulations and stored column-wise (one typed array
+    per column) in a .npz file. Each row is identified by the columns SB,
+    array_config, obs_date and HA, followed by the columns of the file."""
+
+    filename = 'SimulatedCalResultsData.dat'
+    key_columns = ('SB','array_config','obs_date','HA')
+
+    def __init__(self,columns=None):
+        #{column name: numpy array}
+        self.columns = {} if columns is None else columns
+
+    def __len__(self):
+        if len(self.columns) == 0:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    @staticmethod
+    def parse(filepath):
+        """Reads a SimulatedCalResultsData.dat file, returning {'columns':[column
+        names],'rows':[[values as str],...]}, or None if there is no file. The
+        column names are taken from the last comment line before the data."""
+        if not os.path.isfile(filepath):
+            return None
+        header = None
+        rows = []
+        with open(filepath,'r',errors='replace') as file:
+            for line in file:
+                line = line.strip()
+                if line == '':
+                    continue
+                if line.startswith('#'):
+                    if len(rows) == 0:
+                        header = line.lstrip('#').split()
+                    continue
+                rows.append(line.split())
+        n_columns = max((len(row) for row in rows),default=0)
+        if header is None or len(header) != n_columns:
+            header = [f'column{i}' for i in range(n_columns)]
+        #column names are used as names of the arrays in the .npz file
+        header = [re.sub(r'[^\w.+-]','_',name) for name in header]
+        rows = [row+['',]*(n_columns-len(row)) for row in rows]
+        return {'columns':header,'rows':rows}
+
+    @staticmethod
+    def to_array(values):
+        #numerical columns are stored as floats (nan for missing values), others
+        #as strings
+        import numpy as np
+        try:
+            return np.array([np.nan if v == '' else float(v) for v in values])
+        except (ValueError,TypeError):
+            return np.array([str(v) for v in values])
+
+    @classmethod
+    def from_results(cls,results):
+        """results is a list of (SB,array_config,obs_date,HA,parsed file), with
+        the parsed file as returned by parse."""
+        import numpy as np
+        data_columns = []
+        for *_,parsed in results:
+            data_columns += [c for c in parsed['columns'] if c not in data_columns
+                             and c not in cls.key_columns]
+        values = {column:[] for column in cls.key_columns+tuple(data_columns)}
+        for SB,array_config,obs_date,HA,parsed in results:
+            for row in parsed['rows']:
+                row_values = dict(zip(parsed['columns'],row))
+                for column,value in zip(cls.key_columns,
+                                        (SB,array_config,obs_date or '',HA)):
+                    values[column].append(value)
+                for column in data_columns:
+                    values[column].append(row_values.get(column,''))
+        columns = {column:np.array(values[column],dtype=str) for column
+                   in cls.key_columns if column != 'HA'}
+        columns['HA'] = np.array(values['HA'],dtype=float)
+        for column in data_columns:
+            columns[column] = cls.to_array(values[column])
+        return cls(columns=columns)
+
+    def select(self,**conditions):
+        """Returns the rows where each given column has the given value (or one
+        of the given values, if a list is given), e.g.
+        select(SB='HD_16329_a_09_TM1',calibrator='J1924-2914')."""
+        import numpy as np
+        mask = np.ones(len(self),dtype=bool)
+        for column,value in conditions.items():
+            if column not in self.columns:
+                raise ValueError(f'unknown column {column}, available columns: '
+                                 +', '.join(self.columns))
+            mask &= np.isin(self.columns[column],np.atleast_1d(value))
+        return SimulatedCalResults(columns={column:array[mask] for column,array
+                                            in self.columns.items()})
+
+    def write(self,filepath):
+        import numpy as np
+        np.savez_compressed(filepath,**self.columns)
+
+    @classmethod
+    def read(cls,filepath):
+        import numpy as np
+        with np.load(filepath) as data:
+            return cls(columns={column:data[column] for column in data.files})
+
+
+class LogArchive():
+    """Compressed zip archive holding the log files of all simulations of a log
+    folder (one entry per log file and HA), used instead of individual log
+    files to save disk space and inodes."""
+
+    def __init__(self,filepath):
+        self.filepath = filepath
+        #simulations running in parallel append to the same archive
+        self.lock = threading.Lock()
+
+    def add_files(self,filepaths,names):
+        with self.lock:
+            with zipfile.ZipFile(self.filepath,'a',compression=zipfile.ZIP_DEFLATED)\
+                                                                     as archive:
+                for filepath,name in zip(filepaths,names):
+                    archive.write(filepath,arcname=name)
+
+    def remove_files(self,prefixes):
+        #zip files do not support deleting entries, so the archive is rewritten
+        #without the files whose names start with any of the prefixes
+        with self.lock:
+            if not os.path.isfile(self.filepath):
+                return
+            with zipfile.ZipFile(self.filepath,'r') as archive:
+                if not any(name.startswith(prefixes) for name in archive.namelist()):
+                    return
+                tmp_filepath = f'{self.filepath}.tmp'
+                with zipfile.ZipFile(tmp_filepath,'w',compression=zipfile.ZIP_DEFLATED)\
+                                                                     as new_archive:
+                    for info in archive.infolist():
+                        if not info.filename.startswith(prefixes):
+                            new_archive.writestr(info,archive.read(info))
+            os.replace(tmp_filepath,self.filepath)
+
+    def get_names(self):
+        if not os.path.isfile(self.filepath):
+            return []
+        with self.lock:
+            with zipfile.ZipFile(self.filepath,'r') as archive:
+                return archive.namelist()
+
+    def find(self,patterns):
+        #names of the files matching any of the patterns (e.g. 'HA0.0h_*stderr*')
+        return [name for name in self.get_names() if any(fnmatch.fnmatch(name,p)
+                                                         for p in patterns)]
+
+    def read(self,name):
+        with self.lock:
+            with zipfile.ZipFile(self.filepath,'r') as archive:
+                return archive.read(name).decode(errors='replace')
+
+
+class CalibratorIndex():
+    """Index of the calibrator queries over several HAs, mapping each calibrator
+    to the HAs and calibrator types where it is available or was rejected:
+    {calibrator:{'available' or 'rejected':{calibrator type:[[HA,reason],...]}}}
+    (reason is '' for available calibrators)."""
+
+    statuses = ('available','rejected')
+
+    def __init__(self,index=None):
+        self.index = {} if index is None else index
+
+    def add(self,calibrator,status,cal_type,HA,reason=''):
+        assert status in self.statuses
+        calibrator_entry = self.index.setdefault(calibrator,{})
+        calibrator_entry.setdefault(status,{}).setdefault(cal_type,[]).append(
+                                                                      [HA,reason])
+
+    def add_query_results(self,HA,available_calibrators,rejected_calibrators):
+        for cal_type,calibrators in available_calibrators.items():
+            for calibrator in calibrators:
+                self.add(calibrator=calibrator,status='available',cal_type=cal_type,
+                         HA=HA)
+        for cal_type,calibrators in rejected_calibrators.items():
+            for calibrator,reason in calibrators.items():
+                self.add(calibrator=calibrator,status='rejected',cal_type=cal_type,
+                         HA=HA,reason=reason)
+
+    def get_HAs(self,calibrator,cal_type,status='available'):
+        entries = self.index.get(calibrator,{}).get(status,{}).get(cal_type,[])
+        return sorted(HA for HA,_ in entries)
+
+    def describe(self,calibrator,cal_type=None):
+        if calibrator not in self.index:
+            return [f'{calibrator} was not found in any calibrator query']
+        lines = []
+        for status in self.statuses:
+            for c_type,entries in self.index[calibrator].get(status,{}).items():
+                if cal_type is not None and c_type != cal_type:
+                    continue
+                lines.append(f'{status} as {c_type} calibrator:')
+                for HA,reason in sorted(entries):
+                    lines.append(f'    {HA}h' + (f': {reason}' if reason != '' else ''))
+        return lines
+
+    def write(self,filepath):
+        with open(filepath,'w') as file:
+            json.dump(self.index,file)
+
+    @classmethod
+    def read(cls,filepath):
+        with open(filepath,'r') as file:
+            return cls(index=json.load(file))
+
+
+class ProjectCalibratorIndex():
+    """Index of the calibrator queries of all SBs of a project, mapping each
+    calibrator to the SBs, array configurations, observation dates, HAs and
+    calibrator types where it is available or was rejected:
+    {'SBs':{SB:[[array config,obs date,number of HAs],...]},
+     'calibrators':{calibrator:{'available' or 'rejected':{calibrator type:
+                    [[SB,array config,obs date,HA,reason],...]}}}}
+    (reason is '' for available calibrators, obs date is None if not given)."""
+
+    statuses = CalibratorIndex.statuses
+    format_version = 2
+
+    def __init__(self,SBs=None,calibrators=None):
+        self.SBs = {} if SBs is None else SBs
+        self.calibrators = {} if calibrators is None else calibrators
+        #simulations finishing in parallel are added to the same index
+        self.lock = threading.Lock()
+
+    def add_simulation(self,SB,array_config,obs_date,HAs,available_calibrators,
+                       rejected_calibrators):
+        #available_calibrators and rejected_calibrators contain the query
+        #results for each HA, as for CalibratorIndex.add_query_results
+        with self.lock:
+            self.SBs.setdefault(SB,[]).append([array_config,obs_date,len(HAs)])
+            for HA,available,rejected in zip(HAs,available_calibrators,
+                                             rejected_calibrators):
+                entries = [('available',cal_type,calibrator,'') for cal_type,calibrators
+                           in (available or {}).items() for calibrator in calibrators]
+                entries += [('rejected',cal_type,calibrator,reason) for cal_type,calibrators
+                            in (rejected or {}).items()
+                            for calibrator,reason in calibrators.items()]
+                for status,cal_type,calibrator,reason in entries:
+                    self.calibrators.setdefault(calibrator,{}).setdefault(status,{})\
+                          .setdefault(cal_type,[]).append([SB,array_config,obs_date,
+                                                           HA,reason])
+
+    def get_entries(self,calibrator,status,cal_type=None):
+        #[[cal type,SB,array config,obs date,HA,reason],...]
+        return [[c_type,]+entry for c_type,entries
+                in self.calibrators.get(calibrator,{}).get(status,{}).items()
+                if cal_type is None or c_type == cal_type for entry in entries]
+
+    def get_n_HAs(self,SB,array_config=None,obs_date=None):
+        #number of simulated HAs of the SB (over all configurations and dates,
+        #unless given)
+        return sum(n_HAs for config,date,n_HAs in self.SBs[SB]
+                   if array_config in (None,config) and obs_date in (None,date))
+
+    def get_label(self,SB,array_config,obs_date):
+        #configuration and date are only given if the SB was simulated with
+        #several
+        several_configs = len(set(config for config,_,_ in self.SBs[SB])) > 1
+        several_dates = len(set(date for _,date,_ in self.SBs[SB])) > 1
+        return get_simulation_label(
+                   xml_filename=SB,array_config=array_config if several_configs else None,
+                   obs_date=obs_date if several_dates else None)
+
+    def get_SBs_with_calibrator(self,calibrator,cal_type=None):
+        return sorted(set(entry[1] for entry in self.get_entries(
+                                calibrator=calibrator,status='available',
+                                cal_type=cal_type)))
+
+    def get_calibrators_by_usage(self,cal_type=None):
+        #calibrators sorted by the number of SBs where they are available
+        #(most used first)
+        calibrators = sorted(self.calibrators)
+        return sorted(calibrators,key=lambda calibrator: len(
+              self.get_SBs_with_calibrator(calibrator=calibrator,cal_type=cal_type)),
+                      reverse=True)
+
+    def get_matrix_cell(self,calibrator,SB,cal_type=None):
+        #e.g. 'bandpass 5/7 | phase 2/7 (3 rejected)', counting the simulated
+        #HAs of all configurations and dates of the SB
+        cell = []
+        cal_types = sorted(set(entry[0] for status in self.statuses
+                               for entry in self.get_entries(calibrator=calibrator,
+                                                             status=status,
+                                                             cal_type=cal_type)))
+        for c_type in cal_types:
+            n = {status:len(set((config,date,HA) for _,entry_SB,config,date,HA,_
+                                in self.get_entries(calibrator=calibrator,status=status,
+                                                    cal_type=c_type)
+                                if entry_SB == SB)) for status in self.statuses}
+            if n['available']+n['rejected'] == 0:
+                continue
+            text = f'{c_type} {n["available"]}/{self.get_n_HAs(SB=SB)}'
+            if n['rejected'] > 0:
+                text += f' ({n["rejected"]} rejected)'
+            cell.append(text)
+        return ' | '.join(cell)
+
+    def write_matrix(self,filepath,cal_type=None):
+        """Writes a table with one row per calibrator (most used first) and one
+        column per SB, giving for each calibrator type over how many of the HAs
+        the calibrator is available (and how often it was rejected)."""
+        SBs = sorted(self.SBs)
+        with open(filepath,'w',newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['calibrator','SBs where available']+SBs)
+            for calibrator in self.get_calibrators_by_usage(cal_type=cal_type):
+                n_SBs = len(self.get_SBs_with_calibrator(calibrator=calibrator,
+                                                         cal_type=cal_type))
+                row = [self.get_matrix_cell(calibrator=calibrator,SB=SB,cal_type=cal_type)
+                       for SB in SBs]
+                if all(cell == '' for cell in row):
+                    continue
+                writer.writerow([calibrator,f'{n_SBs}/{len(SBs)}']+row)
+
+    def describe(self,calibrator,cal_type=None,SB=None):
+        if calibrator not in self.calibrators:
+            return [f'{calibrator} was not found in any calibrator query']
+        n_SBs = len(self.get_SBs_with_calibrator(calibrator=calibrator,cal_type=cal_type))
+        lines = [f'{calibrator} is available in {n_SBs} of {len(self.SBs)} SB(s)']
+        for status in self.statuses:
+            entries = collections.defaultdict(list)
+            for c_type,entry_SB,config,date,HA,reason in self.get_entries(
+                             calibrator=calibrator,status=status,cal_type=cal_type):
+                if SB is None or entry_SB == SB:
+                    entries[(c_type,entry_SB,config,date or '')].append((HA,reason))
+            for (c_type,entry_SB,config,date),HAs in sorted(entries.items()):
+                date = None if date == '' else date
+                HA_texts = [f'{HA}h' + (f' ({reason})' if reason != '' else '')
+                            for HA,reason in sorted(HAs)]
+                label = self.get_label(SB=entry_SB,array_config=config,obs_date=date)
+                n_HAs = self.get_n_HAs(SB=entry_SB,array_config=config,obs_date=date)
+                lines.append(f'{status} as {c_type} calibrator in {label}'
+                             +f' ({len(HAs)}/{n_HAs} HAs): '+', '.join(HA_texts))
+        return lines
+
+    def describe_usage(self,cal_type=None,n_calibrators=20):
+        #the calibrators most SBs depend on
+        lines = []
+        for calibrator in self.get_calibrators_by_usage(cal_type=cal_type)[:n_calibrators]:
+            SBs = self.get_SBs_with_calibrator(calibrator=calibrator,cal_type=cal_type)
+            if len(SBs) == 0:
+                break
+            cal_types = sorted(set(entry[0] for entry in self.get_entries(
+                           calibrator=calibrator,status='available',cal_type=cal_type)))
+            lines.append(f'{calibrator}: available in {len(SBs)}/{len(self.SBs)} SBs'
+                         +f' (as {", ".join(cal_types)})')
+        return lines
+
+    def write(self,filepath):
+        #written to a temporary file first, since the index is updated while the
+        #simulations are running and may be read at the same time; the lock
+        #also covers the file, which several finishing SBs may write at once
+        with self.lock:
+            content = json.dumps({'format_version':self.format_version,
+                                  'SBs':self.SBs,'calibrators':self.calibrators})
+            tmp_filepath = f'{filepath}.tmp'
+            with open(tmp_filepath,'w') as file:
+                file.write(content)
+            os.replace(tmp_filepath,filepath)
+
+    @classmethod
+    def read(cls,filepath):
+        with open(filepath,'r') as file:
+            content = json.load(file)
+        if content.get('format_version') != cls.format_version:
+            raise RuntimeError(f'{filepath} was written by an older version, please'
+                               +' regenerate it with simulate_tools.py export')
+        return cls(SBs=content['SBs'],calibrators=content['calibrators'])
+
+
+class PersistentEngine():
+    """Runs simulateSB.py in long-lived worker processes (simulateSB_worker.py),
+    which import the modules used by simulateSB.py only once and fork a new
+    process for each simulation. The output is passed through named pipes in
+    the working directory, so it can be streamed like the output of a
+    subprocess."""
+
+    worker_script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'simulateSB_worker.py')
+
+    def __init__(self):
+        self.simulateSB_path = shutil.which('simulateSB.py')
+        if self.simulateSB_path is None:
+            raise RuntimeError('simulateSB.py not found')
+        self.simulateSB_path = os.path.realpath(self.simulateSB_path)
+        self.interpreter = self.get_interpreter()
+        #workers are started when needed, so there is one per parallel job
+        self.idle_workers = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def get_interpreter(self):
+        #the workers use the same interpreter as simulateSB.py itself
+        with open(self.simulateSB_path,'r') as file:
+            first_line = file.readline()
+        if first_line.startswith('#!') and 'python' in first_line:
+            return shlex.split(first_line[2:])
+        return [sys.executable,]
+
+    def start_worker(self):
+        worker = subprocess.Popen(self.interpreter+[self.worker_script,
+                                                    self.simulateSB_path],
+                                  stdin=subprocess.PIPE,stdout=subprocess.PIPE,
+                                  text=True)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def acquire_worker(self):
+        try:
+            return self.idle_workers.get_nowait()
+        except queue.Empty:
+            return self.start_worker()
+
+    def start(self,command,work_dir):
+        """Starts the simulation given by command (as for subprocess) in work_dir
+        and returns an EngineProcess."""
+        fifos = {}
+        for key in ('stdout','stderr'):
+            fifos[key] = os.path.join(work_dir,f'.simulateSB_{key}.fifo')
+            os.mkfifo(fifos[key])
+        worker = self.acquire_worker()
+        worker.stdin.write(json.dumps({'cwd':os.path.abspath(work_dir),
+                                       'argv':command[1:],
+                                       'stdout':os.path.abspath(fifos['stdout']),
+                                       'stderr':os.path.abspath(fifos['stderr'])})+'\n')
+        worker.stdin.flush()
+        reply = self.read_reply(worker=worker)
+        return EngineProcess(engine=self,worker=worker,pid=reply['pid'],fifos=fifos)
+
+    @staticmethod
+    def read_reply(worker):
+        line = worker.stdout.readline()
+        if line == '':
+            raise RuntimeError('simulateSB worker terminated unexpectedly, exit code '
+                               +f'{worker.wait()}')
+        return json.loads(line)
+
+    def release_worker(self,worker):
+        self.idle_workers.put(worker)
+
+    def close(self):
+        #the workers exit when their input is closed
+        for worker in self.workers:
+            worker.stdin.close()
+        for worker in self.workers:
+            worker.wait()
+            worker.stdout.close()
+
+
+class EngineProcess():
+    """A simulation running in a worker of the PersistentEngine, with the
+    attributes of a subprocess.Popen that are used by SBSimulation."""
+
+    def __init__(self,engine,worker,pid,fifos):
+        self.engine = engine
+        self.worker = worker
+        self.pid = pid
+        self.fifos = fifos
+        self.returncode = None
+        self.stdout = self.read_fifo(fifos['stdout'])
+        self.stderr = self.read_fifo(fifos['stderr'])
+
+    @staticmethod
+    def read_fifo(fifo):
+        #the fifo is opened when the first line is read (opening blocks until
+        #the simulation has opened the other end)
+        with open(fifo,'r',errors='replace') as file:
+            yield from file
+
+    def release_fifos(self):
+        #if the simulation was killed before opening the fifos, readers would
+        #block forever; opening and closing the write end releases them
+        for fifo in self.fifos.values():
+            try:
+                os.close(os.open(fifo,os.O_WRONLY|os.O_NONBLOCK))
+            except OSError:
+                #no reader waiting
+                pass
+
+    def wait(self,on_exit=None):
+        """Waits for the simulation to finish and returns its resource usage.
+        As for wait_for_process, on_exit is called before the simulation is
+        reaped (the worker waits for the confirmation to reap it)."""
+        self.engine.read_reply(worker=self.worker)
+        if on_exit is not None:
+            on_exit()
+        self.worker.stdin.write('\n')
+        self.worker.stdin.flush()
+        reply = self.engine.read_reply(worker=self.worker)
+        self.engine.release_worker(worker=self.worker)
+        self.returncode = reply['returncode']
+        self.release_fifos()
+        return types.SimpleNamespace(ru_maxrss=reply['maxrss_kB'])
+
+
+class PrioritySemaphore():
+    """asyncio semaphore that gives a free slot to the waiting task with the
+    highest priority (instead of the task that has waited longest); tasks with
+    the same priority get the slots in the order they arrived."""
+
+    def __init__(self,value):
+        self.value = value
+        #heap of (-priority,arrival,future)
+        self.waiters = []
+        self.arrivals = itertools.count()
+
+    async def acquire(self,priority):
+        if self.value > 0 and len(self.waiters) == 0:
+            self.value -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters,(-priority,next(self.arrivals),future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            #the slot may have been handed over just before the cancellation
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while len(self.waiters) > 0:
+            _,_,future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.value += 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self,priority):
+        await self.acquire(priority=priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
 class SBSimulation():
 
     #simulateSB_optional_arguments = {'array_config':'C','correlator':'c'}
     #the following list is in the order of how queries are conducted by OSS!
     calibrator_query_identifiers = ['diffgain','bandpass','phase','check']
+    #number of latest lines of stdout and stderr kept in memory to identify errors:
+    n_output_lines_to_keep = 100
 
     def __init__(self,xml_file,log_folder,min_HA,max_HA,HA_step,obs_date,writeQueryLog,
-                 array_config,check_array_config=True):
+                 array_config,xml_data=None,check_array_config=True,cache=None,
+                 window_resolution=None,timeout=None,fatal_patterns=(),
+                 results_store=None,profiler=None,journal_records=None,HAs=None,
+                 engine=None,log_archive=None,prescreen=None,duration_history=None,
+                 array_config_file=None,keep_failed=False):
         self.xml_file = xml_file
-        self.xml_data = OT_XML_File(filepath=xml_file)
-        self.log_files_prefix = f'log_{xml_file}'
+        self.profiler = Profiler() if profiler is None else profiler
+        #xml_data can be provided if the xml file was already parsed
+        if xml_data is None:
+            with self.profiler.phase('xml parsing'):
+                xml_data = OT_XML_File(filepath=xml_file)
+        self.xml_data = xml_data
+        #simulateSB.py is executed in a separate working directory for each HA,
+        #where the xml file is available under its base name
+        self.xml_filename = os.path.basename(xml_file)
+        self.log_files_prefix = f'log_{self.xml_filename}'
         self.log_folder = log_folder
+        #if provided (LogArchive), the log files are added to the archive instead
+        #of being moved into the log folder
+        self.log_archive = log_archive
         self.min_HA = min_HA
         self.max_HA = max_HA
         self.HA_step = HA_step
+        #the HAs can be given explicitly, otherwise they are determined from
+        #min_HA, max_HA and HA_step:
+        self.HAs = HAs
         self.obs_date = obs_date
         self.writeQueryLog = writeQueryLog
         self.array_config = array_config
+        #if the array configuration is a configuration file, its absolute path,
+        #since simulateSB.py runs in a working directory inside the log folder
+        #(array_config is kept as the name of the configuration)
+        if array_config_file is None and os.path.isfile(array_config):
+            array_config_file = array_config
+        self.array_config_file = None if array_config_file is None\
+                                      else os.path.abspath(array_config_file)
+        self.cache = cache
+        #if provided, simulateSB.py is run by the PersistentEngine instead of
+        #a new subprocess for each simulation
+        self.engine = engine
+        #if provided (Prescreen), simulations that are predicted to fail are not
+        #run
+        self.prescreen = prescreen
+        #if provided (DurationHistory), the durations of the simulations are
+        #recorded, and previous durations are used to estimate the runtime
+        self.duration_history = duration_history
+        #if not None, search the HA window where the simulation succeeds by
+        #bisecting the HA grid down to this resolution:
+        self.window_resolution = window_resolution
+        #simulations are aborted if they take longer than timeout (in s), or if
+        #their output matches one of the fatal patterns (regular expressions)
+        self.timeout = timeout
+        self.fatal_patterns = [re.compile(p) for p in fatal_patterns]
+        #if provided, a record of each simulation is appended as soon as it is done
+        self.results_store = results_store
+        #records (by HA) of a previous run that is resumed:
+        self.journal_records = {} if journal_records is None else journal_records
+        #by default, failed simulations of the journal are run again
+        self.keep_failed = keep_failed
+        #HAs that are run again because they failed in the resumed run
+        self.rerun_HAs = set()
         #self.correlator = correlator
         if check_array_config:
             self.check_array_config()
@@ -199,18 +1525,131 @@ class SBSimulation():
                 f"Nominal configuration(s) of this SB: {nominal_configs}. Do "
                 f"you really wish to simulate with configuration '{self.array_config}'?")
 
-    def run(self):
-        self.determine_HAs_to_simulate()
-        self.remove_existing_log_files()
-        self.run_simulations()
+    def prepare(self):
+        if self.HAs is None:
+            self.determine_HAs_to_simulate()
+        #outputs of the simulations, in the order of self.HAs:
+        self.outputs = [None]*len(self.HAs)
+        #estimated duration (in s) of a single simulation, None if unknown
+        self.duration_estimate = None
+        if self.duration_history is not None:
+            self.duration_key = self.get_duration_key()
+            self.duration_estimate,_ = self.duration_history.estimate(key=self.duration_key)
+
+    def get_duration_key(self):
+        return DurationHistory.get_key(modeName=self.xml_data.read_modeName(),
+                                       array_config=self.array_config,
+                                       band=self.xml_data.read_receiver_bands())
+
+    def journal_record_is_reusable(self,record):
+        if (record['array_config'],record['obs_date'],record['writeQueryLog'])\
+                          != (self.array_config,self.obs_date,self.writeQueryLog):
+            return False
+        if record['status'] in ('aborted','predicted failure'):
+            #predicted failures are cheap to predict again (with the current
+            #settings)
+            return False
+        if record['status'] == 'failure' and not self.keep_failed:
+            self.rerun_HAs.add(record['HA'])
+            return False
+        #check that the log files of the simulation are still there
+        log_files = record.get('log_files')
+        if log_files is None:
+            return False
+        if record.get('log_archive') is not None:
+            if self.log_archive is None\
+                   or os.path.basename(self.log_archive.filepath) != record['log_archive']:
+                return False
+            archived_files = set(self.log_archive.get_names())
+            return all(log_f in archived_files for log_f in log_files)
+        return all(os.path.isfile(os.path.join(self.log_folder,log_f)) for log_f
+                   in log_files)
+
+    def select_HA_indices_to_simulate(self,HA_indices):
+        """Returns the indices of the HAs that need to be simulated, i.e. that
+        are neither restored from the journal nor predicted to fail."""
+        return self.prescreen_HAs(HA_indices=self.restore_outputs(HA_indices=HA_indices))
+
+    def prescreen_HAs(self,HA_indices):
+        """Stores the outputs of simulations that are predicted to fail, and
+        returns the indices of the HAs that still need to be simulated."""
+        if self.prescreen is None or len(HA_indices) == 0:
+            return HA_indices
+        with self.profiler.phase('prescreen'):
+            reasons = self.prescreen.predict_failures(
+                       coordinates=self.xml_data.get_representative_coordinates(),
+                       HAs=[self.HAs[i] for i in HA_indices],obs_date=self.obs_date)
+        pending_HA_indices = []
+        for HA_index,reason in zip(HA_indices,reasons):
+            if reason is None:
+                pending_HA_indices.append(HA_index)
+                continue
+            HA = self.HAs[HA_index]
+            output = {'result':f'predicted failure (not simulated): {reason}',
+                      'returncode':None,
+                      'available_calibrators':{} if self.writeQueryLog else None,
+                      'rejected_calibrators':{} if self.writeQueryLog else None,
+                      'cal_results':None,'aborted':False,'predicted':True}
+            self.store_output(HA_index=HA_index,output=output)
+            self.profiler.count('predicted failures')
+            if self.results_store is not None:
+                self.record_result(HA=HA,epoch=self.get_epoch(HA=HA),output=output,
+                                   duration=0,cached=False,log_files=[])
+        n_predicted = len(HA_indices)-len(pending_HA_indices)
+        if n_predicted > 0:
+            print(f'{self.xml_filename}: {n_predicted} simulation(s) predicted to fail,'
+                  +' not simulated')
+        return pending_HA_indices
+
+    def restore_outputs(self,HA_indices):
+        """When resuming a previous run, restores the outputs of completed
+        simulations from the journal. Returns the indices of the HAs that still
+        need to be simulated."""
+        pending_HA_indices = []
+        n_restored = 0
+        for HA_index in HA_indices:
+            record = self.journal_records.get(self.HAs[HA_index])
+            if record is not None and self.journal_record_is_reusable(record=record):
+                self.outputs[HA_index] = {
+                        key:record[key] for key in ('result','returncode',
+                                                    'available_calibrators',
+                                                    'rejected_calibrators')}
+                self.outputs[HA_index]['cal_results'] = record.get('cal_results')
+                n_restored += 1
+            else:
+                pending_HA_indices.append(HA_index)
+        if n_restored > 0:
+            print(f'{self.xml_filename}: restored {n_restored} completed simulation(s)'
+                  +' from the journal')
+        if len(self.journal_records) > 0 and self.log_archive is not None:
+            #the archive may still hold the logs of an earlier attempt of the
+            #simulations that are run again
+            prefixes = tuple(f'HA{self.HAs[HA_index]}h_' for HA_index in pending_HA_indices)
+            self.log_archive.remove_files(prefixes=prefixes)
+        return pending_HA_indices
+
+    def finish(self):
+        self.sort_by_HA()
         if self.writeQueryLog:
-            self.summarize_available_calibrators()
+            with self.profiler.phase('summary writing'):
+                self.summarize_available_calibrators()
+                self.write_calibrator_index()
         self.print_results()
 
+    def expected_cost(self):
+        #runtime of a single simulation of this SB, used to start the longest
+        #simulations first; the estimate from previous durations is available
+        #for all SBs or none (see DurationHistory.estimate), otherwise the size
+        #of the xml is used as rough proxy (larger SBs, with more targets,
+        #spectral setups etc., take longer to simulate)
+        if self.duration_estimate is not None:
+            return self.duration_estimate
+        return os.path.getsize(self.xml_file)
+
     def determine_HAs_to_simulate(self):
         rep_coord = self.xml_data.get_representative_coordinates()
         #DSA will consider the following HA limits:
-        if rep_coord.dec.deg >= -5:
+        if rep_coord.dec_deg >= -5:
             DSA_min_HA = -3
             DSA_max_HA = 2
         else:
@@ -241,10 +1680,10 @@ class SBSimulation():
             HA_counter += 1
 
     @staticmethod
-    def identify_error(pipes):
-        pipe_messages = {key:p.split('\n') for key,p in pipes.items()}
+    def identify_error(pipe_tails):
+        #pipe_tails contains the latest lines of stdout and stderr
         pipe_messages = {key:[m for m in messages if m!=''] for key,messages
-                         in pipe_messages.items()}
+                         in pipe_tails.items()}
         #check messages, starting from the latest
         msg_iterator = itertools.zip_longest(pipe_messages['stdout'][::-1],
                                              pipe_messages['stderr'][::-1],
@@ -261,117 +1700,419 @@ class SBSimulation():
                 break
         print('did not find error message, will take last output'
               +' of stdout instead')
-        return pipes['stdout'][-1]
-
-    def get_log_files(self):
-        return glob.glob(f'{self.log_files_prefix}_*.txt')
-
-    def remove_existing_log_files(self):
-        old_log_files = self.get_log_files()
-        if len(old_log_files) > 0:
-            print('found existing log files (from previous run?):')
-            for lf in old_log_files:
-                print(lf)
-            remove_log_files = ask_yes_no_with_yes_as_default(
-                                                      'remove these log files?')
-            if remove_log_files:
-                for lf in old_log_files:
-                    print(f'deleting {lf}')
-                    os.remove(lf)
-            else:
-                sys.exit('aborting, please remove log files')
+        if len(pipe_messages['stdout']) == 0:
+            return 'unknown error (no output)'
+        return pipe_messages['stdout'][-1]
+
+    def get_log_files(self,work_dir):
+        return glob.glob(os.path.join(work_dir,f'{self.log_files_prefix}_*.txt'))
 
-    def get_cal_query_file_names(self):
-         return [f'{self.log_files_prefix}_{cal}_1.txt' for cal in
-                 self.calibrator_query_identifiers]
+    def get_cal_query_file_names(self,work_dir):
+         return [os.path.join(work_dir,f'{self.log_files_prefix}_{cal}_1.txt')
+                 for cal in self.calibrator_query_identifiers]
 
-    def determine_available_calibrators(self):
+    @staticmethod
+    def parse_cal_query_line(line):
+        """Returns the calibrator listed in a line of a calibrator query file and
+        the reason for its rejection ('' if accepted), or None if the line does
+        not contain a calibrator."""
+        splitted = line.split('|')
+        if len(splitted) <= 2:
+            return None
+        calibrator = splitted[1].replace(' ','')
+        if calibrator[:1] != '[':
+            #line is not containing a calibrator
+            return None
+        calibrator = calibrator[1:].split(']')[0]
+        reason = splitted[-2].strip()
+        return calibrator,reason
+
+    def process_cal_queries(self,work_dir):
+        """Reads each calibrator query file once, extracting the accepted and
+        rejected calibrators while concatenating the files into a single log
+        file. Returns the available calibrators (list for each calibrator type)
+        and the rejected calibrators (dict with the rejection reason of each
+        calibrator, for each calibrator type)."""
         available_calibrators = {}
-        cal_query_filenames = self.get_cal_query_file_names()
-        for cal_type,filename in zip(self.calibrator_query_identifiers,
-                                     cal_query_filenames):
-            if not os.path.isfile(filename):
-                continue
-            available_calibrators[cal_type] = []
-            with open(filename,"r") as file:
-                for line in file:
-                    splitted = line.replace(' ','').split('|')
-                    if len(splitted) > 2:
-                        calibrator,reason = splitted[1],splitted[-2]
-                        if calibrator == '':
-                            continue
-                        if calibrator[0] != '[':
-                            #line is not containing a calibrator
-                            continue
-                        if reason != '':
-                            #calibrator was rejected
-                            continue
-                        calibrator = calibrator.split(']')[0]
-                        calibrator = calibrator.replace('[','')
-                        available_calibrators[cal_type].append(calibrator)
-        return available_calibrators
-
-    def concatenate_cal_queries(self):
-        output_filename = f'{self.log_files_prefix}_calibrator_queries.txt'
-        cal_query_filenames = self.get_cal_query_file_names()
+        rejected_calibrators = {}
+        output_filename = os.path.join(
+                       work_dir,f'{self.log_files_prefix}_calibrator_queries.txt')
+        cal_query_filenames = self.get_cal_query_file_names(work_dir=work_dir)
         with open(output_filename,'w') as outfile:
-            for fname in cal_query_filenames:
-                if os.path.isfile(fname):
-                    with open(fname,'r') as infile:
-                        outfile.write(infile.read())
-                        outfile.write('\n\n######################################\n\n')
-                    os.remove(fname)
-
-    def move_log_files(self,HA):
-        log_files = self.get_log_files()
+            for cal_type,filename in zip(self.calibrator_query_identifiers,
+                                         cal_query_filenames):
+                if not os.path.isfile(filename):
+                    continue
+                available = available_calibrators[cal_type] = []
+                rejected = rejected_calibrators[cal_type] = {}
+                with open(filename,'r') as infile:
+                    for line in infile:
+                        outfile.write(line)
+                        parsed = self.parse_cal_query_line(line)
+                        if parsed is None:
+                            continue
+                        calibrator,reason = parsed
+                        if reason == '':
+                            available.append(calibrator)
+                        else:
+                            rejected[calibrator] = reason
+                outfile.write('\n\n######################################\n\n')
+                os.remove(filename)
+        return available_calibrators,rejected_calibrators
+
+    def archive_log_files(self,HA,work_dir):
+        #returns the names of the log files in the archive
+        log_files = self.get_log_files(work_dir=work_dir)
+        archived_log_filenames = [f'HA{HA}h_{os.path.basename(log_f)}' for log_f
+                                  in log_files]
+        self.log_archive.add_files(filepaths=log_files,names=archived_log_filenames)
+        return archived_log_filenames
+
+    def move_log_files(self,HA,work_dir):
+        #returns the names of the log files in the log folder
+        log_files = self.get_log_files(work_dir=work_dir)
+        moved_log_filenames = []
         for log_f in log_files:
-            shutil.move(src=log_f,dst=os.path.join(self.log_folder,f'HA{HA}h_{log_f}'))
+            moved_log_filename = f'HA{HA}h_{os.path.basename(log_f)}'
+            shutil.move(src=log_f,dst=os.path.join(self.log_folder,moved_log_filename))
+            moved_log_filenames.append(moved_log_filename)
+        return moved_log_filenames
 
-    def run_simulations(self):
-        self.results = []
+    def get_epoch(self,HA):
+        epoch = f'TRANSIT{HA:+}h'
+        if self.obs_date is not None:
+            epoch += f',{self.obs_date}'
+        return epoch
+
+    def create_work_dir(self,HA):
+        #each run gets its own working directory, such that concurrent runs do
+        #not overwrite each other's log files and SimulatedCalResultsData.dat
+        work_dir = tempfile.mkdtemp(prefix=f'.HA{HA}h_',dir=self.log_folder)
+        os.symlink(os.path.abspath(self.xml_file),
+                   os.path.join(work_dir,self.xml_filename))
+        return work_dir
+
+    def get_command(self,epoch):
+        command = ["simulateSB.py", self.xml_filename,epoch]
+        if self.array_config_file is not None:
+            command += ["-C", self.array_config_file]
+        elif self.array_config != "default":
+            command += ["-C", self.array_config]
         if self.writeQueryLog:
-            self.available_calibrators = []
-        for HA in self.HAs:
-            epoch = f'TRANSIT{HA:+}h'
-            if self.obs_date is not None:
-                epoch += f',{self.obs_date}'
-            command = ["simulateSB.py", self.xml_file,epoch]
-            if self.array_config != "default":
-                command += ["-C", self.array_config]
-            if self.writeQueryLog:
-                command.append('--writeQueryLog')
-            print(f'executing command: {" ".join(command)}')
-            process = subprocess.run(command,text=True,capture_output=True)
-            if process.returncode != 0:
-                pipes = {'stdout':process.stdout,'stderr':process.stderr}
-                errormessage = self.identify_error(pipes=pipes)
-                self.results.append(errormessage)
+            command.append('--writeQueryLog')
+        return command
+
+    def get_cache_key(self,epoch):
+        if self.obs_date is None:
+            #simulateSB.py simulates today, so the result is only valid today
+            epoch += f',{datetime.datetime.now(datetime.timezone.utc).date()}'
+        return self.cache.get_key(xml_file=self.xml_file,epoch=epoch,
+                                  array_config=self.array_config,
+                                  writeQueryLog=self.writeQueryLog,
+                                  array_config_file=self.array_config_file)
+
+    def stream_pipe(self,pipe,log_filepath,tail,process,abort_info):
+        #writes the output line by line to the log file, keeping only the latest
+        #lines in memory; kills the process if a fatal pattern appears
+        with open(log_filepath,'w') as log_file:
+            for line in pipe:
+                log_file.write(line)
+                line = line.rstrip('\n')
+                tail.append(line)
+                if 'reason' in abort_info:
+                    continue
+                for pattern in self.fatal_patterns:
+                    if pattern.search(line) is not None:
+                        self.abort(process=process,abort_info=abort_info,
+                                   reason='aborted, output matched fatal pattern '
+                                          +f'"{pattern.pattern}": {line}')
+                        break
+
+    @staticmethod
+    def abort(process,abort_info,reason):
+        #the process group is only killed while the process has not been reaped,
+        #otherwise its pid may already belong to another process
+        with abort_info['lock']:
+            if 'reason' not in abort_info:
+                abort_info['reason'] = reason
+            if not abort_info['exited']:
+                kill_process_group(process)
+
+    def abort_on_timeout(self,process,abort_info):
+        with abort_info['lock']:
+            #the timer can fire just after the simulation finished
+            if abort_info['exited']:
+                return
+            self.abort(process=process,abort_info=abort_info,
+                       reason=f'aborted, no result after timeout of {self.timeout}s')
+
+    @staticmethod
+    def mark_exited(abort_info):
+        with abort_info['lock']:
+            abort_info['exited'] = True
+
+    def execute_simulateSB(self,command,work_dir):
+        print(f'executing command: {" ".join(command)}')
+        if self.engine is None:
+            #new session, such that child processes of simulateSB.py can be killed
+            #together with it
+            process = subprocess.Popen(command,text=True,errors='replace',cwd=work_dir,
+                                       stdout=subprocess.PIPE,stderr=subprocess.PIPE,
+                                       start_new_session=True)
+        else:
+            process = self.engine.start(command=command,work_dir=work_dir)
+        pipe_tails = {key:collections.deque(maxlen=self.n_output_lines_to_keep)
+                      for key in ('stdout','stderr')}
+        #reason for aborting the simulation (if any), and whether it has exited
+        abort_info = {'lock':threading.RLock(),'exited':False}
+        streaming_threads = []
+        try:
+            for key,pipe in (('stdout',process.stdout),('stderr',process.stderr)):
+                log_filepath = os.path.join(work_dir,f'{self.log_files_prefix}_{key}.txt')
+                thread = threading.Thread(
+                            target=self.stream_pipe,
+                            kwargs={'pipe':pipe,'log_filepath':log_filepath,
+                                    'tail':pipe_tails[key],'process':process,
+                                    'abort_info':abort_info})
+                thread.start()
+                streaming_threads.append(thread)
+            start_time = time.perf_counter()
+            if self.timeout is not None:
+                timer = threading.Timer(interval=self.timeout,function=self.abort_on_timeout,
+                                        kwargs={'process':process,'abort_info':abort_info})
+                timer.start()
+            on_exit = functools.partial(self.mark_exited,abort_info=abort_info)
+            if self.engine is None:
+                resource_usage = wait_for_process(process=process,on_exit=on_exit)
             else:
-                self.results.append('success')
-            if self.writeQueryLog:
-                self.available_calibrators.append(
-                                        self.determine_available_calibrators())
-                self.concatenate_cal_queries()
-            self.move_log_files(HA=HA)        
-
-    def queried_calibrator_types(self):
+                resource_usage = process.wait(on_exit=on_exit)
+            if self.timeout is not None:
+                timer.cancel()
+            for thread in streaming_threads:
+                thread.join()
+        finally:
+            #the pipes of a subprocess are not closed when it is reaped (for the
+            #persistent engine, this closes the fifo readers)
+            process.stdout.close()
+            process.stderr.close()
+        duration = time.perf_counter()-start_time
+        self.profiler.add_time(phase='simulateSB.py',duration=duration)
+        self.profiler.add_simulation(
+              command=' '.join(command),duration=duration,
+              #ru_maxrss is in kB
+              peak_rss_MB=resource_usage.ru_maxrss/1e3,
+              output_MB=sum(os.path.getsize(os.path.join(
+                                work_dir,f'{self.log_files_prefix}_{key}.txt'))
+                            for key in pipe_tails)/1e6)
+        if self.duration_history is not None and 'reason' not in abort_info:
+            #aborted simulations did not run to completion
+            self.duration_history.add(key=self.duration_key,duration=duration)
+        if 'reason' in abort_info:
+            result = abort_info['reason']
+        elif process.returncode != 0:
+            result = self.identify_error(pipe_tails=pipe_tails)
+        else:
+            result = 'success'
+        if self.writeQueryLog:
+            with self.profiler.phase('calibrator query processing'):
+                available_calibrators,rejected_calibrators = self.process_cal_queries(
+                                                                    work_dir=work_dir)
+        else:
+            available_calibrators,rejected_calibrators = None,None
+        with self.profiler.phase('calibrator results parsing'):
+            cal_results = SimulatedCalResults.parse(
+                          filepath=os.path.join(work_dir,SimulatedCalResults.filename))
+        return {'returncode':process.returncode,'result':result,
+                'available_calibrators':available_calibrators,
+                'rejected_calibrators':rejected_calibrators,
+                'cal_results':cal_results,'aborted':'reason' in abort_info}
+
+    def get_status(self,output):
+        if output['result'] == 'success':
+            return 'success'
+        if output.get('aborted',False):
+            return 'aborted'
+        if output.get('predicted',False):
+            return 'predicted failure'
+        return 'failure'
+
+    def record_result(self,HA,epoch,output,duration,cached,log_files):
+        record = {'SB':Path(self.xml_filename).stem,'xml_file':self.xml_filename,
+                  'HA':HA,'epoch':epoch,'array_config':self.array_config,
+                  'obs_date':self.obs_date,'writeQueryLog':self.writeQueryLog,
+                  'status':self.get_status(output=output),
+                  'result':output['result'],'returncode':output['returncode'],
+                  'duration_s':round(duration,3),'cached':cached,
+                  'available_calibrators':output['available_calibrators'],
+                  'rejected_calibrators':output['rejected_calibrators'],
+                  'cal_results':output.get('cal_results'),
+                  'log_folder':self.log_folder,'log_files':log_files,
+                  'log_archive':None if self.log_archive is None
+                                else os.path.basename(self.log_archive.filepath),
+                  'finished':datetime.datetime.now().isoformat(timespec='seconds')}
+        self.results_store.append(record=record)
+
+    def simulate_HA(self,HA):
+        start_time = time.perf_counter()
+        epoch = self.get_epoch(HA=HA)
+        command = self.get_command(epoch=epoch)
+        work_dir = self.create_work_dir(HA=HA)
+        cached_output = None
+        if self.cache is not None:
+            with self.profiler.phase('cache'):
+                cache_key = self.get_cache_key(epoch=epoch)
+                #a failure of the resumed run is simulated again, rather than
+                #restored from the cache (the new result replaces the cached one)
+                if HA not in self.rerun_HAs:
+                    cached_output = self.cache.load(key=cache_key,work_dir=work_dir)
+        if cached_output is None:
+            output = self.execute_simulateSB(command=command,work_dir=work_dir)
+            #aborted simulations depend on the timeout and fatal patterns, which
+            #are not part of the cache key, so they are not cached
+            if self.cache is not None and not output['aborted']:
+                with self.profiler.phase('cache'):
+                    self.cache.store(key=cache_key,output=output,
+                                     log_files=self.get_log_files(work_dir=work_dir))
+        else:
+            print(f'using cached result for command: {" ".join(command)}')
+            self.profiler.count('cache hits')
+            output = cached_output
+        if self.log_archive is None:
+            with self.profiler.phase('log file moving'):
+                log_files = self.move_log_files(HA=HA,work_dir=work_dir)
+                shutil.rmtree(work_dir)
+        else:
+            with self.profiler.phase('log archiving'):
+                log_files = self.archive_log_files(HA=HA,work_dir=work_dir)
+                shutil.rmtree(work_dir)
+        if self.results_store is not None:
+            self.record_result(HA=HA,epoch=epoch,output=output,
+                               duration=time.perf_counter()-start_time,
+                               cached=cached_output is not None,log_files=log_files)
+        return output
+
+    def simulate_HA_index(self,HA_index):
+        output = self.simulate_HA(HA=self.HAs[HA_index])
+        self.store_output(HA_index=HA_index,output=output)
+
+    def store_output(self,HA_index,output):
+        #outputs are stored in the order of self.HAs, independent of the order
+        #in which the simulations finish
+        self.outputs[HA_index] = output
+
+    @property
+    def results(self):
+        return [output['result'] for output in self.outputs]
+
+    @property
+    def available_calibrators(self):
+        return [output['available_calibrators'] for output in self.outputs]
+
+    @property
+    def rejected_calibrators(self):
+        return [output['rejected_calibrators'] for output in self.outputs]
+
+    def simulation_succeeded(self,HA_index):
+        return self.outputs[HA_index]['result'] == 'success'
+
+    def get_HA_indices_sorted_by_HA(self):
+        return sorted(range(len(self.HAs)),key=lambda i: self.HAs[i])
+
+    def add_window_bisection_HAs(self):
+        """If searching for the HA window, adds the midpoints between neighbouring
+        HAs where the simulation succeeded for one and failed for the other, as long
+        as they are separated by more than the requested resolution. Returns the
+        indices of the added HAs that still need to be simulated."""
+        if self.window_resolution is None:
+            return []
+        sorted_indices = self.get_HA_indices_sorted_by_HA()
+        new_HAs = []
+        for i,j in zip(sorted_indices[:-1],sorted_indices[1:]):
+            if self.simulation_succeeded(i) == self.simulation_succeeded(j):
+                continue
+            if self.HAs[j]-self.HAs[i] <= self.window_resolution:
+                continue
+            new_HAs.append(round((self.HAs[i]+self.HAs[j])/2,6))
+        n_HAs = len(self.HAs)
+        self.HAs += new_HAs
+        self.outputs += [None]*len(new_HAs)
+        return self.select_HA_indices_to_simulate(HA_indices=range(n_HAs,len(self.HAs)))
+
+    def sort_by_HA(self):
+        sorted_indices = self.get_HA_indices_sorted_by_HA()
+        self.HAs = [self.HAs[i] for i in sorted_indices]
+        self.outputs = [self.outputs[i] for i in sorted_indices]
+
+    def get_HA_windows(self):
+        """Returns the HA intervals where the simulation succeeded, together with
+        the failures (HA and error) just outside of each interval (None if the
+        interval extends to the edge of the simulated HA range). Assumes that
+        the results are sorted by HA."""
+        windows = []
+        results = self.results
+        window_start = None
+        for i,HA in enumerate(self.HAs):
+            if self.simulation_succeeded(i):
+                if window_start is None:
+                    window_start = i
+                is_last = (i == len(self.HAs)-1)
+                if is_last or not self.simulation_succeeded(i+1):
+                    lower_failure = None if window_start == 0 else\
+                         (self.HAs[window_start-1],results[window_start-1])
+                    upper_failure = None if is_last else (self.HAs[i+1],results[i+1])
+                    windows.append({'min_HA':self.HAs[window_start],'max_HA':HA,
+                                    'lower_failure':lower_failure,
+                                    'upper_failure':upper_failure})
+                    window_start = None
+        return windows
+
+    def get_HA_window_description(self):
+        lines = ['HA window(s) where the simulation succeeds (resolution '
+                 +f'{self.window_resolution}h):']
+        windows = self.get_HA_windows()
+        if len(windows) == 0:
+            lines.append('none')
+        for window in windows:
+            lines.append(f'{window["min_HA"]}h to {window["max_HA"]}h')
+            for edge,failure in (('lower','lower_failure'),('upper','upper_failure')):
+                if window[failure] is None:
+                    lines.append(f'    {edge} edge: end of simulated HA range')
+                else:
+                    HA,error = window[failure]
+                    lines.append(f'    {edge} edge: failed at {HA}h: {error}')
+        return '\n'.join(lines)
+
+    def get_cal_results(self):
+        #(SB,array_config,obs_date,HA,parsed SimulatedCalResultsData.dat) of the
+        #simulations that wrote the file
+        return [(Path(self.xml_filename).stem,self.array_config,self.obs_date,HA,
+                 output['cal_results']) for HA,output in zip(self.HAs,self.outputs)
+                if output.get('cal_results') is not None]
+
+    def get_HA_table_row(self):
+        return [(HA,self.get_status(output=output),output['available_calibrators'])
+                for HA,output in zip(self.HAs,self.outputs)]
+
+    @staticmethod
+    def queried_calibrator_types(available_calibrators):
         calibrator_types = []
-        for available_cals in self.available_calibrators:
+        for available_cals in available_calibrators:
             calibrator_types += list(available_cals.keys())
         return list(set(calibrator_types))
 
-    def summarize_available_calibrators(self):
-        out_filename = os.path.join(self.log_folder,'available_calibrators.csv')
-        calibrator_types = self.queried_calibrator_types()
+    @classmethod
+    def write_available_calibrators_csv(cls,out_filename,HAs,available_calibrators):
+        calibrator_types = cls.queried_calibrator_types(
+                                     available_calibrators=available_calibrators)
         #order the calibrator types according to the query order:
         calibrator_types = sorted(
                              calibrator_types,
-                             key=lambda x:self.calibrator_query_identifiers.index(x))
+                             key=lambda x:cls.calibrator_query_identifiers.index(x))
         with open(out_filename,'w') as file:
             file.write('HA,')
             file.write(','.join(calibrator_types))
             file.write('\n')
-            for HA,available_cals in zip(self.HAs,self.available_calibrators):
+            for HA,available_cals in zip(HAs,available_calibrators):
                 file.write(f'{HA},')
                 for cal_type in calibrator_types:
                     if cal_type in available_cals:
@@ -387,56 +2128,128 @@ class SBSimulation():
                     file.write(',')
                 file.write('\n')
 
+    def summarize_available_calibrators(self):
+        self.write_available_calibrators_csv(
+                  out_filename=os.path.join(self.log_folder,'available_calibrators.csv'),
+                  HAs=self.HAs,available_calibrators=self.available_calibrators)
+
+    def write_calibrator_index(self):
+        index = CalibratorIndex()
+        for HA,available,rejected in zip(self.HAs,self.available_calibrators,
+                                         self.rejected_calibrators):
+            index.add_query_results(HA=HA,available_calibrators=available,
+                                    rejected_calibrators=rejected)
+        index.write(filepath=os.path.join(self.log_folder,'calibrator_index.json'))
+
+    @staticmethod
+    def get_results_lines(HAs,results):
+        return [f'{HA}h: {result}' for HA,result in zip(HAs,results)]
+
     def print_results(self):
-        for HA,result in zip(self.HAs,self.results):
-            print(f'{HA}h: {result}')
+        for line in self.get_results_lines(HAs=self.HAs,results=self.results):
+            print(line)
+        if self.window_resolution is not None:
+            print(self.get_HA_window_description())
 
     def append_results_to_file(self,filename):
         with open(filename,'a') as file:
-            for HA,result in zip(self.HAs,self.results):
-                file.write(f'{HA}h: {result}\n')
+            for line in self.get_results_lines(HAs=self.HAs,results=self.results):
+                file.write(line+'\n')
+            if self.window_resolution is not None:
+                file.write(self.get_HA_window_description()+'\n')
 
 
 class Simulation():
 
-    sim_result_filename = 'SimulatedCalResultsData.dat'
-
     def __init__(self, args):
         self.args = args
+        self.profiler = Profiler(code_profiler=args.profile_code)
+        #check the arguments first, before any time is spent on downloading or
+        #extracting xmls
+        self.check_HA_args()
+        self.check_jobs_arg()
+        self.check_plan_args()
+        self.obs_dates = self.get_obs_dates()
+        #whether the user already confirmed the array configuration for all SBs,
+        #such that it is not checked for each SB
+        self.array_config_confirmed = False
         positional = args.positional_args
         if len(positional) == 2:
             self.handle_file_input(*positional)
-        elif len(positional) == 3:
-            self.handle_code_sb_input(*positional)
+        elif len(positional) >= 3:
+            #project code, one or more SB names, array config
+            self.handle_code_sb_input(project_code=positional[0],
+                                      sb_names=positional[1:-1],
+                                      array_config=positional[-1])
         else:
             raise ValueError("invalid number of positional arguments")
-        self.check_HA_args()
         self.check_array_config()
 
     def handle_file_input(self, filename, array_config):
-        self.array_config = array_config
+        self.set_array_configs(array_config=array_config)
         suffix = Path(filename).suffix
+        self.SBs_to_download = {}
         if suffix == ".xml":
             self.input_mode = "xml"
             self.xml_files = [filename]
+            self.xml_data = {}
         elif suffix == ".aot":
             self.confirm_aot_usage()
             self.input_mode = "aot"
-            self.xml_files = self.extract_xml_files_from_aot(filename)
+            self.xml_folder = self.create_xml_folder()
+            with self.profiler.phase('aot extraction'):
+                self.xml_data = self.extract_xml_files_from_aot(
+                                       aot_file=filename,output_folder=self.xml_folder)
+            self.xml_files = sorted(self.xml_data.keys())
         else:
             raise ValueError("invalid arguments")
 
-    def handle_code_sb_input(self, project_code, sb_name, array_config):
-        self.array_config = array_config
+    def handle_code_sb_input(self, project_code, sb_names, array_config):
+        self.set_array_configs(array_config=array_config)
         self.input_mode = "sb"
-        xml_filename = self.get_xml_filename(SB_name=sb_name)
-        xml_file = OT_XML_File.download_xml_file(
-            project_code=project_code,
-            SB=sb_name,
-            filename=xml_filename,
-        )
-        print(f"downloaded {xml_file}")
-        self.xml_files = [xml_file]
+        self.project_code = project_code
+        self.xml_folder = self.create_xml_folder()
+        self.xml_files = [os.path.join(self.xml_folder,self.get_xml_filename(SB_name=sb_name))
+                          for sb_name in sb_names]
+        self.xml_data = {}
+        #the SBs to be downloaded, by xml file
+        self.SBs_to_download = dict(zip(self.xml_files,sb_names))
+        if not self.args.pipeline or self.args.dry_run:
+            #otherwise, each SB is downloaded when the pipeline gets to it
+            self.download_SBs(sb_names=sb_names)
+
+    def download_SBs(self,sb_names):
+        with self.profiler.phase('xml download'):
+            xml_strs = OT_XML_File.retrieve_xml_strs(
+                project_code=self.project_code,
+                SBs=sb_names,
+                max_age_hours=self.args.xml_max_age,
+            )
+        for sb_name in sb_names:
+            xml_file = os.path.join(self.xml_folder,
+                                    self.get_xml_filename(SB_name=sb_name))
+            with open(xml_file,'w') as file:
+                file.write(xml_strs[sb_name])
+            with self.profiler.phase('xml parsing'):
+                self.xml_data[xml_file] = OT_XML_File(filepath=None,
+                                                      xml_str=xml_strs[sb_name])
+        print(f"retrieved {', '.join(sb_names)}")
+
+    def set_array_configs(self,array_config):
+        #several configurations can be given as comma-separated list
+        self.array_config = array_config
+        self.array_configs = array_config.split(',')
+        if len(set(self.array_configs)) < len(self.array_configs):
+            raise ValueError(f'array configuration given several times: {array_config}')
+
+    def several_array_configs(self):
+        return len(self.array_configs) > 1
+
+    @staticmethod
+    def create_xml_folder():
+        #private folder for the xml files of this run, such that several runs
+        #in the same directory do not interfere
+        return tempfile.mkdtemp(prefix='simulateSB_HA_wrapper_xmls_')
 
     def confirm_aot_usage(self):
         ask_question_exit_if_answer_no(
@@ -444,6 +2257,20 @@ class Simulation():
             f'"{self.array_config}" for all SBs. '
             "Do you want to proceed?"
         )
+        self.array_config_confirmed = True
+
+    def confirm_pipeline_downloads(self):
+        #the SBs downloaded by the pipeline are only available while simulations
+        #are running, so their nominal configurations cannot be checked before
+        if self.array_config_confirmed or len(self.SBs_to_download) == 0:
+            return
+        ask_question_exit_if_answer_no(
+            "ATTENTION: with --pipeline, the SBs are downloaded while simulating,"
+            f' so antenna configuration "{self.array_config}" will be used for all'
+            " SBs without checking their nominal configurations. Do you want to"
+            " proceed?"
+        )
+        self.array_config_confirmed = True
 
     def check_HA_args(self):
         if self.args.min_HA is not None and self.args.max_HA is not None:
@@ -451,9 +2278,61 @@ class Simulation():
                 raise ValueError('min_HA needs to be smaller than max_HA')
         if self.args.HA_step <= 0:
             raise ValueError('HA step needs to be larger than 0')
+        if self.args.find_window and self.args.window_resolution <= 0:
+            raise ValueError('window resolution needs to be larger than 0')
+        if self.args.timeout is not None and self.args.timeout <= 0:
+            raise ValueError('timeout needs to be larger than 0')
+        for pattern in self.args.fatal_pattern:
+            try:
+                re.compile(pattern)
+            except re.error as error:
+                raise ValueError(f'invalid fatal pattern "{pattern}": {error}')
+
+    def check_plan_args(self):
+        if self.args.plan is not None and self.args.find_window:
+            #the bisection depends on the results, so it cannot be planned ahead
+            raise ValueError('find_window cannot be used when writing a plan')
+        if self.args.plan is not None and self.args.pipeline:
+            raise ValueError('pipeline cannot be used when writing a plan')
+        if self.args.plan is not None and self.args.dry_run:
+            raise ValueError('plan and dry_run cannot be used together')
+        if self.args.pipeline and self.args.max_downloads < 1:
+            raise ValueError('number of concurrent downloads needs to be at least 1')
+        if self.args.pipeline and self.args.download_batch < 1:
+            raise ValueError('number of SBs per download needs to be at least 1')
+
+    def get_obs_dates(self):
+        #--date_range start:end:step (step in days) expands into a list of dates,
+        #including start and end
+        if self.args.date_range is None:
+            return [self.args.obs_date,]
+        if self.args.obs_date is not None:
+            raise ValueError('obs_date and date_range cannot be used together')
+        try:
+            start,end,step = self.args.date_range.split(':')
+            start = datetime.date.fromisoformat(start)
+            end = datetime.date.fromisoformat(end)
+            step = int(step)
+        except ValueError:
+            raise ValueError('date range needs to be given as start:end:step, e.g.'
+                             +' 2024-10-01:2025-03-31:14 (step in days)')
+        if start > end:
+            raise ValueError('start of date range needs to be before its end')
+        if step < 1:
+            raise ValueError('step of date range needs to be at least 1 day')
+        n_dates = (end-start).days//step + 1
+        return [(start+datetime.timedelta(days=i*step)).isoformat()
+                for i in range(n_dates)]
+
+    def several_obs_dates(self):
+        return len(self.obs_dates) > 1
+
+    def check_jobs_arg(self):
+        if self.args.jobs < 1:
+            raise ValueError('number of jobs needs to be at least 1')
 
     def check_array_config(self):
-        if self.array_config == "default":
+        if "default" in self.array_configs:
             print("user requests that simulateSB.py decides the array configuration to simulate")
 
     def aot_was_provided(self):
@@ -462,42 +2341,156 @@ class Simulation():
     def xml_was_provided(self):
         return self.input_mode == "xml"
 
+    def writes_summary_file(self):
+        return self.aot_was_provided() or len(self.xml_files) > 1\
+                  or self.several_array_configs() or self.several_obs_dates()
+
     def run(self):
         #self.prepare_xml_files()
+        if self.args.plan is not None:
+            self.write_plan()
+            return
+        if self.args.dry_run:
+            self.dry_run()
+            return
         self.prepare_log_folders()
-        if self.aot_was_provided():
+        if self.writes_summary_file():
             self.prepare_summary_file()
-        self.run_simulations()
+        self.prepare_results_store()
+        with self.profiler.phase('simulations (wall time)'):
+            #only the wrapper's own code is profiled, since simulateSB.py runs
+            #in separate processes
+            with self.profiler.code_profiling(
+                       output_prefix=self.args.positional_args[0]):
+                self.run_simulations()
         self.clean_up()
+        if self.args.profile:
+            self.report_profile()
+
+    def report_profile(self):
+        print('\ntime spent in the different phases (summed over parallel jobs):')
+        for line in self.profiler.get_report_lines():
+            print(line)
+        timing_filename = f'{self.args.positional_args[0]}_timing.json'
+        self.profiler.write(filepath=timing_filename)
+        print(f'timing information written to {timing_filename}')
 
     @staticmethod
     def get_xml_filename(SB_name):
         return f'{SB_name}.xml'
 
     @staticmethod
-    def extract_xml_files_from_aot(aot_file):
+    def extract_xml_files_from_aot(aot_file,output_folder):
+        """Extracts the SB xmls from the aot file into output_folder, named by
+        the SB names. Returns a dict with the parsed OT_XML_File of each
+        extracted file."""
         print(f'going to extract xml files from {aot_file}')
         xml_pattern = 'Sch*.xml'
-        old_xml_files = glob.glob(xml_pattern)
-        if len(old_xml_files) > 0:
-            raise RuntimeError('cannot extract xmls from .aot because some xmls'
-                               +' already exist, please delete')
-        os.system(f'unzip {aot_file} {xml_pattern}')
-        extracted_xml_files = glob.glob(xml_pattern)
-        output_xml_filenames = []
-        for xml_file in extracted_xml_files:
-            xml = OT_XML_File(xml_file)
-            SB_name = xml.get_SB_name()
-            new_xml_filename = Simulation.get_xml_filename(SB_name=SB_name)
-            os.rename(xml_file,new_xml_filename)
-            output_xml_filenames.append(new_xml_filename)
-        print(f'extracted following xml files: {output_xml_filenames}')
-        return output_xml_filenames
+        xml_data = {}
+        with zipfile.ZipFile(aot_file) as aot:
+            for member in aot.namelist():
+                if not fnmatch.fnmatch(member,xml_pattern):
+                    continue
+                xml_bytes = aot.read(member)
+                #parsed only once, the tree is reused for the simulation
+                xml = OT_XML_File(filepath=None,xml_str=xml_bytes)
+                SB_name = xml.get_SB_name()
+                xml_file = os.path.join(
+                               output_folder,Simulation.get_xml_filename(SB_name=SB_name))
+                if xml_file in xml_data:
+                    raise RuntimeError(f'found several SBs with name {SB_name} in'
+                                       +f' {aot_file}')
+                with open(xml_file,'wb') as file:
+                    file.write(xml_bytes)
+                xml_data[xml_file] = xml
+        print('extracted following xml files: '
+              +f'{[os.path.basename(xml_file) for xml_file in xml_data]}')
+        return xml_data
+
+    def get_log_folders(self):
+        return [f'log_files_{Path(xml_file).stem}' for xml_file in self.xml_files]
+
+    def write_plan(self):
+        #instead of running the simulations, write them into a manifest that
+        #can be executed by several workers
+        self.log_folders = self.get_log_folders()
+        self.cache,self.engine,self.results_store,self.journal = None,None,None,{}
+        #all simulations of the plan are run by the workers (which prescreen
+        #according to the settings of the manifest)
+        self.prescreen = None
+        #such that the manifest starts with the longest simulations
+        self.duration_history = self.create_duration_history()
+        SB_simulations = self.create_SB_simulations()
+        manifest = JobManifest.from_SB_simulations(
+                        SB_simulations=SB_simulations,
+                        settings={'writeQueryLog':self.args.writeQueryLog,
+                                  'timeout':self.args.timeout,
+                                  'fatal_patterns':self.args.fatal_pattern,
+                                  'log_archive':self.args.log_archive,
+                                  'prescreen':not self.args.no_prescreen,
+                                  'min_elevation':self.args.min_elevation,
+                                  'min_sun_separation':self.args.min_sun_separation})
+        manifest.write(filepath=self.args.plan)
+        print(f'wrote {len(manifest.jobs)} simulations of {len(self.xml_files)} SB(s)'
+              +f' to {self.args.plan}')
+        if not self.xml_was_provided():
+            shutil.rmtree(self.xml_folder)
+
+    def dry_run(self):
+        #resolves all simulations without running them, and estimates their
+        #runtime from the durations of previous runs
+        self.log_folders = self.get_log_folders()
+        self.cache,self.engine,self.results_store,self.journal = None,None,None,{}
+        results_filename = self.get_results_filename()
+        if self.args.resume and os.path.exists(results_filename):
+            print(f'estimating the simulations not completed in {results_filename}')
+            self.journal = ResultsStore(filepath=results_filename).get_journal()
+        self.prescreen = self.create_prescreen()
+        self.duration_history = self.create_duration_history()
+        SB_simulations = self.create_SB_simulations()
+        n_simulations = [len(sim.select_HA_indices_to_simulate(
+                                              HA_indices=range(len(sim.HAs))))
+                         for sim in SB_simulations]
+        self.print_runtime_estimate(SB_simulations=SB_simulations,
+                                    n_simulations=n_simulations)
+        if not self.xml_was_provided():
+            shutil.rmtree(self.xml_folder)
+
+    def print_runtime_estimate(self,SB_simulations,n_simulations):
+        print(f'\ndry run, {sum(n_simulations)} simulation(s) of'
+              +f' {len(self.xml_files)} SB(s) to run:')
+        durations = []
+        for sim,n in zip(SB_simulations,n_simulations):
+            label = self.get_label(xml_file=sim.xml_file,array_config=sim.array_config,
+                                   obs_date=sim.obs_date)
+            line = f'{label}: {n} of {len(sim.HAs)} HA(s)'\
+                   +f' ({sim.duration_key.replace("|",", ")})'
+            if sim.duration_estimate is not None:
+                _,description = self.duration_history.estimate(key=sim.duration_key)
+                line += f', {format_duration(sim.duration_estimate)} per simulation'\
+                        +f' (from {description})'
+                durations += [sim.duration_estimate,]*n
+            print(line)
+        if len(durations) < sum(n_simulations):
+            print('no durations of previous simulations in'
+                  +f' {self.duration_history.filepath}, cannot estimate the runtime')
+            return
+        print(f'estimated CPU time: {format_duration(sum(durations))}')
+        makespan = estimate_makespan(durations=durations,n_workers=self.args.jobs)
+        print(f'estimated makespan with {self.args.jobs} parallel job(s):'
+              +f' {format_duration(makespan)}')
+        if self.args.find_window:
+            print('(not including the simulations to refine the HA window boundaries)')
 
     def prepare_log_folders(self):
-        self.log_folders = [f'log_files_{xml_file[:-4]}' for xml_file in self.xml_files]
+        self.log_folders = self.get_log_folders()
         for log_folder in self.log_folders:
-            if os.path.isdir(log_folder):
+            if self.args.resume and os.path.isdir(log_folder):
+                #remove working directories of simulations that were interrupted
+                for work_dir in glob.glob(os.path.join(log_folder,'**','.HA*'),
+                                          recursive=True):
+                    shutil.rmtree(work_dir)
+            elif os.path.isdir(log_folder):
                 remove_existing_log_folder = ask_yes_no_with_yes_as_default(
                             f'remove existing log folder {log_folder}?')
                 if remove_existing_log_folder:
@@ -505,7 +2498,26 @@ class Simulation():
                     shutil.rmtree(log_folder)
                 else:
                     sys.exit('aborting, please remove or rename folder containing log files')
-            os.mkdir(log_folder)
+            for array_config,obs_date in itertools.product(self.array_configs,
+                                                           self.obs_dates):
+                os.makedirs(self.get_sim_log_folder(log_folder=log_folder,
+                                                    array_config=array_config,
+                                                    obs_date=obs_date),
+                            exist_ok=True)
+
+    def get_config_log_folder(self,log_folder,array_config):
+        #with several configurations, each gets its own subfolder
+        if not self.several_array_configs():
+            return log_folder
+        return os.path.join(log_folder,os.path.basename(array_config))
+
+    def get_sim_log_folder(self,log_folder,array_config,obs_date):
+        #with several observation dates, each gets its own subfolder
+        config_log_folder = self.get_config_log_folder(log_folder=log_folder,
+                                                       array_config=array_config)
+        if not self.several_obs_dates():
+            return config_log_folder
+        return os.path.join(config_log_folder,obs_date)
 
     def prepare_summary_file(self):
         self.summary_filename = f'{self.args.positional_args[0]}_simulation_summary.txt'
@@ -513,45 +2525,515 @@ class Simulation():
             print(f'deleting {self.summary_filename}')
             os.remove(self.summary_filename)
 
-    def run_simulations(self):
+    def get_results_filename(self):
+        return f'{self.args.positional_args[0]}_results.jsonl'
+
+    def prepare_results_store(self):
+        results_filename = self.get_results_filename()
+        self.journal = {}
+        if self.args.resume and os.path.exists(results_filename):
+            print(f'resuming from journal {results_filename}')
+            self.journal = ResultsStore(filepath=results_filename).get_journal()
+        elif os.path.exists(results_filename):
+            print(f'deleting {results_filename}')
+            os.remove(results_filename)
+        self.results_store = ResultsStore(filepath=results_filename)
+
+    def create_SB_simulations(self):
+        SB_simulations = []
         for xml_file,log_folder in zip(self.xml_files,self.log_folders):
-            print(f'going to run simulations of {xml_file}')
-            if self.aot_was_provided():
-                with open(self.summary_filename,'a') as file:
-                    file.write(f'\n{xml_file}\n')
+            SB_simulations += self.create_simulations_of_SB(xml_file=xml_file,
+                                                            log_folder=log_folder)
+        return SB_simulations
+
+    def create_simulations_of_SB(self,xml_file,log_folder):
+        #one simulation per array configuration and observation date
+        SB_simulations = []
+        window_resolution = self.args.window_resolution if self.args.find_window\
+                                                          else None
+        #the parsed xml is shared by the simulations of all configurations
+        xml_data = self.xml_data.get(xml_file)
+        if xml_data is None:
+            with self.profiler.phase('xml parsing'):
+                xml_data = OT_XML_File(filepath=xml_file)
+        for array_config,obs_date in itertools.product(self.array_configs,
+                                                       self.obs_dates):
+            label = self.get_label(xml_file=xml_file,array_config=array_config,
+                                   obs_date=obs_date)
+            print(f'preparing simulations of {label}')
             #If aot file was provided, I just ask about the array config at the start,
-            #and not for each SB again:
-            check_array_config = not self.aot_was_provided()
+            #and not for each SB again (nor for each date):
+            check_array_config = not self.array_config_confirmed\
+                                 and obs_date == self.obs_dates[0]
+            sim_log_folder = self.get_sim_log_folder(log_folder=log_folder,
+                                                     array_config=array_config,
+                                                     obs_date=obs_date)
             sim = SBSimulation(
-                        xml_file=xml_file,log_folder=log_folder,min_HA=self.args.min_HA,
-                        max_HA=self.args.max_HA,HA_step=self.args.HA_step,
-                        obs_date=self.args.obs_date,writeQueryLog=self.args.writeQueryLog,
-                        array_config=self.array_config,check_array_config=check_array_config)
-            sim.run()
-            if self.aot_was_provided():
+                    xml_file=xml_file,xml_data=xml_data,log_folder=sim_log_folder,
+                    min_HA=self.args.min_HA,
+                    max_HA=self.args.max_HA,HA_step=self.args.HA_step,
+                    obs_date=obs_date,writeQueryLog=self.args.writeQueryLog,
+                    array_config=array_config,check_array_config=check_array_config,
+                    cache=self.cache,engine=self.engine,
+                    log_archive=self.get_log_archive(log_folder=sim_log_folder),
+                    prescreen=self.prescreen,duration_history=self.duration_history,
+                    window_resolution=window_resolution,timeout=self.args.timeout,
+                    fatal_patterns=self.args.fatal_pattern,
+                    results_store=self.results_store,profiler=self.profiler,
+                    journal_records=self.journal.get((os.path.basename(xml_file),
+                                                      array_config,obs_date)),
+                    keep_failed=self.args.keep_failed)
+            sim.prepare()
+            SB_simulations.append(sim)
+        return SB_simulations
+
+    def get_log_archive(self,log_folder):
+        if not self.args.log_archive:
+            return None
+        return LogArchive(filepath=os.path.join(log_folder,'logs.zip'))
+
+    def get_label(self,xml_file,array_config,obs_date):
+        return get_simulation_label(
+                   xml_filename=os.path.basename(xml_file),
+                   array_config=array_config if self.several_array_configs() else None,
+                   obs_date=obs_date if self.several_obs_dates() else None)
+
+    @staticmethod
+    def schedule_jobs(jobs):
+        #all (SB,HA) pairs of the project are run from one flat queue, such that
+        #the worker pool stays busy across SBs; longest expected jobs go first
+        #(sorting is stable, so the HAs of a SB stay in order)
+        return sorted(jobs,key=lambda job: job[0].expected_cost(),reverse=True)
+
+    @staticmethod
+    def run_job(job):
+        sim,HA_index = job
+        sim.simulate_HA_index(HA_index=HA_index)
+
+    def create_cache(self):
+        if self.args.no_cache:
+            return None
+        return SimulationCache(folder=self.args.cache_dir,refresh=self.args.refresh_cache)
+
+    def create_engine(self):
+        if self.args.engine == 'subprocess':
+            return None
+        return PersistentEngine()
+
+    def create_duration_history(self):
+        return DurationHistory(filepath=self.args.duration_history)
+
+    def create_prescreen(self):
+        if self.args.no_prescreen:
+            return None
+        return Prescreen(min_elevation_deg=self.args.min_elevation,
+                         min_sun_separation_deg=self.args.min_sun_separation)
+
+    def run_simulations(self):
+        self.cache = self.create_cache()
+        self.engine = self.create_engine()
+        self.prescreen = self.create_prescreen()
+        self.duration_history = self.create_duration_history()
+        #filled as the simulations of each SB finish
+        self.project_index = ProjectCalibratorIndex()
+        try:
+            if self.args.pipeline:
+                #all questions are asked before the pipeline starts, rather than
+                #in the middle of the output of the simulations
+                self.confirm_pipeline_downloads()
+                prepared_simulations = {
+                    xml_file:self.create_simulations_of_SB(xml_file=xml_file,
+                                                           log_folder=log_folder)
+                    for xml_file,log_folder in zip(self.xml_files,self.log_folders)
+                    if xml_file not in self.SBs_to_download}
+                SB_simulations = asyncio.run(self.run_pipeline(
+                                         prepared_simulations=prepared_simulations))
+            else:
+                SB_simulations = self.run_job_queue()
+                for sim in SB_simulations:
+                    self.finish_simulation(sim=sim)
+        finally:
+            if self.engine is not None:
+                self.engine.close()
+            self.duration_history.write()
+        self.summarize_simulations(SB_simulations=SB_simulations)
+
+    def run_job_queue(self):
+        SB_simulations = self.create_SB_simulations()
+        jobs = [(sim,HA_index) for sim in SB_simulations
+                for HA_index in sim.select_HA_indices_to_simulate(
+                                                  HA_indices=range(len(sim.HAs)))]
+        print(f'going to run {len(jobs)} simulations of {len(SB_simulations)} SB(s)'
+              +f' using {self.args.jobs} parallel job(s)')
+        while len(jobs) > 0:
+            run_in_parallel(function=self.run_job,arguments=self.schedule_jobs(jobs),
+                            n_jobs=self.args.jobs)
+            #when searching HA windows, the boundaries are refined by bisection:
+            jobs = [(sim,HA_index) for sim in SB_simulations
+                    for HA_index in sim.add_window_bisection_HAs()]
+            if len(jobs) > 0:
+                print(f'refining HA window boundaries with {len(jobs)} simulation(s)')
+        return SB_simulations
+
+    async def run_pipeline(self,prepared_simulations):
+        """Runs the SBs as a pipeline: each SB is downloaded and parsed, its
+        simulations are run and its results are written independently of the
+        other SBs, such that e.g. the download of a SB overlaps with the
+        simulations of the previous SBs. prepared_simulations contains the
+        simulations of the SBs that did not need to be downloaded, by xml file.
+        Returns the simulations in the order of the SBs."""
+        #the downloads and simulations run in threads (a simulation waits for
+        #its simulateSB.py process); the event loop limits how many run at once,
+        #starting the longest simulations first
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+                               max_workers=self.args.jobs+self.args.max_downloads)
+        self.simulation_slots = PrioritySemaphore(self.args.jobs)
+        self.download_slots = asyncio.Semaphore(self.args.max_downloads)
+        downloads = self.start_batch_downloads()
+        print(f'running the simulations of {len(self.xml_files)} SB(s) as a pipeline'
+              +f' using {self.args.jobs} parallel job(s)')
+        try:
+            SB_simulations = await asyncio.gather(
+                   *[self.run_SB_in_pipeline(xml_file=xml_file,log_folder=log_folder,
+                                             SB_simulations=prepared_simulations.get(xml_file),
+                                             download=downloads.get(xml_file))
+                     for xml_file,log_folder in zip(self.xml_files,self.log_folders)])
+        finally:
+            self.executor.shutdown()
+        return [sim for simulations in SB_simulations for sim in simulations]
+
+    def start_batch_downloads(self):
+        #the SBs are downloaded in batches of --download_batch SBs, each with a
+        #single getsb.py invocation (i.e. a single connection); returns the
+        #download task of each xml file
+        xml_files = [xml_file for xml_file in self.xml_files
+                     if xml_file in self.SBs_to_download]
+        downloads = {}
+        for i in range(0,len(xml_files),self.args.download_batch):
+            batch = xml_files[i:i+self.args.download_batch]
+            download = asyncio.ensure_future(self.download_batch(
+                         sb_names=[self.SBs_to_download[xml_file] for xml_file in batch]))
+            downloads.update({xml_file:download for xml_file in batch})
+        return downloads
+
+    async def download_batch(self,sb_names):
+        async with self.download_slots:
+            await self.run_in_thread(self.download_SBs,sb_names=sb_names)
+
+    async def run_in_thread(self,function,**kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(function,**kwargs))
+
+    async def run_SB_in_pipeline(self,xml_file,log_folder,SB_simulations=None,
+                                 download=None):
+        if SB_simulations is None:
+            #the SB starts as soon as its batch is downloaded
+            await download
+            SB_simulations = self.create_simulations_of_SB(xml_file=xml_file,
+                                                           log_folder=log_folder)
+        await asyncio.gather(*[self.run_simulation_in_pipeline(sim=sim)
+                               for sim in SB_simulations])
+        return SB_simulations
+
+    async def run_simulation_in_pipeline(self,sim):
+        HA_indices = sim.select_HA_indices_to_simulate(HA_indices=range(len(sim.HAs)))
+        while len(HA_indices) > 0:
+            await asyncio.gather(*[self.run_epoch_in_pipeline(sim=sim,HA_index=HA_index)
+                                   for HA_index in HA_indices])
+            #when searching HA windows, the boundaries are refined by bisection:
+            HA_indices = sim.add_window_bisection_HAs()
+        #the results of the SB are written as soon as its simulations are done
+        await self.run_in_thread(self.finish_simulation,sim=sim)
+
+    async def run_epoch_in_pipeline(self,sim,HA_index):
+        async with self.simulation_slots.slot(priority=sim.expected_cost()):
+            await self.run_in_thread(sim.simulate_HA_index,HA_index=HA_index)
+
+    def finish_simulation(self,sim):
+        label = self.get_label(xml_file=sim.xml_file,array_config=sim.array_config,
+                               obs_date=sim.obs_date)
+        print(f'\nresults of {label}')
+        sim.finish()
+        if self.args.writeQueryLog:
+            #the project index is updated as soon as the simulations of a SB are
+            #done, such that it can be queried during long runs
+            self.project_index.add_simulation(
+                      SB=sim.xml_filename,array_config=sim.array_config,
+                      obs_date=sim.obs_date,HAs=sim.HAs,
+                      available_calibrators=sim.available_calibrators,
+                      rejected_calibrators=sim.rejected_calibrators)
+            if self.writes_summary_file():
+                self.project_index.write(filepath=self.get_project_index_filename())
+        print('\n------------------------------------------\n')
+
+    def summarize_simulations(self,SB_simulations):
+        for sim in SB_simulations:
+            label = self.get_label(xml_file=sim.xml_file,array_config=sim.array_config,
+                                   obs_date=sim.obs_date)
+            if self.writes_summary_file():
+                with open(self.summary_filename,'a') as file:
+                    file.write(f'\n{label}\n')
                 sim.append_results_to_file(filename=self.summary_filename)
-            print('\n------------------------------------------\n')
+        if self.several_array_configs():
+            self.write_config_HA_matrices(SB_simulations=SB_simulations)
+        if self.several_obs_dates():
+            self.write_date_HA_grids(SB_simulations=SB_simulations)
+        if self.args.writeQueryLog and self.writes_summary_file():
+            self.write_project_calibrator_index()
+        self.write_cal_results(SB_simulations=SB_simulations)
+
+    def write_cal_results(self,SB_simulations):
+        results = [result for sim in SB_simulations for result in sim.get_cal_results()]
+        if len(results) == 0:
+            return
+        with self.profiler.phase('summary writing'):
+            cal_results = SimulatedCalResults.from_results(results=results)
+            filepath = f'{self.args.positional_args[0]}_cal_results.npz'
+            cal_results.write(filepath=filepath)
+        print(f'simulated calibrator results ({SimulatedCalResults.filename}) of all'
+              +f' simulations: {filepath}')
+
+    def get_project_index_filename(self):
+        return f'{self.args.positional_args[0]}_calibrator_index.json'
+
+    def write_project_calibrator_index(self):
+        prefix = self.args.positional_args[0]
+        index_filename = self.get_project_index_filename()
+        self.project_index.write(filepath=index_filename)
+        self.project_index.write_matrix(filepath=f'{prefix}_calibrator_matrix.csv')
+        print(f'calibrators of all SBs: {prefix}_calibrator_matrix.csv (query with'
+              +f' python simulate_tools.py project {index_filename})')
+        print('calibrators available in most SBs:')
+        for line in self.project_index.describe_usage(n_calibrators=5):
+            print(f'    {line}')
+
+    def write_config_HA_matrices(self,SB_simulations):
+        for xml_file,log_folder in zip(self.xml_files,self.log_folders):
+            for obs_date in self.obs_dates:
+                rows = {sim.array_config:sim.get_HA_table_row() for sim in SB_simulations
+                        if sim.xml_file == xml_file and sim.obs_date == obs_date}
+                matrix_filename = os.path.join(
+                        log_folder,get_config_HA_matrix_filename(
+                                obs_date=obs_date if self.several_obs_dates() else None))
+                write_config_HA_matrix(filename=matrix_filename,rows=rows)
+                print(f'configuration x HA table for {os.path.basename(xml_file)}:'
+                      +f' {matrix_filename}')
+
+    def write_date_HA_grids(self,SB_simulations):
+        for xml_file,log_folder in zip(self.xml_files,self.log_folders):
+            for array_config in self.array_configs:
+                rows = {sim.obs_date:sim.get_HA_table_row() for sim in SB_simulations
+                        if sim.xml_file == xml_file and sim.array_config == array_config}
+                folder = self.get_config_log_folder(log_folder=log_folder,
+                                                    array_config=array_config)
+                write_date_HA_grids(folder=folder,rows=rows)
+                print(f'date x HA tables for {self.get_label(xml_file,array_config,None)}:'
+                      +f' {os.path.join(folder,"date_HA_*.csv")}')
 
     def clean_up(self):
         if not self.xml_was_provided():
-            for xml_file in self.xml_files:
-                os.remove(xml_file)
-                print(f'deleted {xml_file}')
-        os.remove(self.sim_result_filename)
-        print(f'deleted {self.sim_result_filename}')    
+            shutil.rmtree(self.xml_folder)
+            print(f'deleted {self.xml_folder}')
         keep_log_files = ask_yes_no_with_yes_as_default('keep log files?')
         if not keep_log_files:
             for log_folder in self.log_folders:
                 shutil.rmtree(log_folder)
                 print(f'deleted {log_folder}')
-            if self.aot_was_provided():
+            if self.writes_summary_file():
                 os.remove(self.summary_filename)
         else:
             print('log files can be found in following folder(s)): '
                   +f'{", ".join(self.log_folders)}')
-            if self.aot_was_provided():
+            if self.writes_summary_file():
                 print(f'summary file: {self.summary_filename}')
+        print(f'results of all simulations: {self.results_store.filepath}')
+
+
+class JobManifest():
+    """Description of all simulations of a run (one job per SB, array
+    configuration and epoch), with the SB xmls and array configuration files
+    embedded, such that the
+    simulations can be split into shards that are run by independent workers
+    (e.g. on several nodes of a cluster)."""
+
+    format_version = 1
+
+    def __init__(self,xml_strs,jobs,settings,config_strs=None):
+        #xml_strs: {xml filename: content of the xml}
+        self.xml_strs = xml_strs
+        #config_strs: {array config: content of the configuration file}, for the
+        #array configurations given as file
+        self.config_strs = {} if config_strs is None else config_strs
+        #jobs: list of dicts with xml_file, array_config, obs_date, HA, log_folder
+        self.jobs = jobs
+        #settings: writeQueryLog, timeout, fatal_patterns, log_archive, prescreen,
+        #min_elevation, min_sun_separation
+        self.settings = settings
+
+    @classmethod
+    def from_SB_simulations(cls,SB_simulations,settings):
+        xml_strs = {}
+        config_strs = {}
+        jobs = []
+        #longest jobs first, such that the shards get a similar amount of work
+        for sim in sorted(SB_simulations,key=lambda sim: sim.expected_cost(),
+                          reverse=True):
+            if sim.xml_filename not in xml_strs:
+                with open(sim.xml_file,'r') as file:
+                    xml_strs[sim.xml_filename] = file.read()
+            if sim.array_config_file is not None and sim.array_config not in config_strs:
+                with open(sim.array_config_file,'r') as file:
+                    config_strs[sim.array_config] = file.read()
+            for HA in sim.HAs:
+                jobs.append({'xml_file':sim.xml_filename,'array_config':sim.array_config,
+                             'obs_date':sim.obs_date,'HA':HA,
+                             'log_folder':sim.log_folder})
+        return cls(xml_strs=xml_strs,jobs=jobs,settings=settings,
+                   config_strs=config_strs)
+
+    def write(self,filepath):
+        with open(filepath,'w') as file:
+            json.dump({'format_version':self.format_version,'settings':self.settings,
+                       'xmls':self.xml_strs,'config_files':self.config_strs,
+                       'jobs':self.jobs},file,indent=1)
+
+    @classmethod
+    def read(cls,filepath):
+        with open(filepath,'r') as file:
+            content = json.load(file)
+        if content['format_version'] != cls.format_version:
+            raise RuntimeError(f'unsupported manifest format: {filepath}')
+        return cls(xml_strs=content['xmls'],jobs=content['jobs'],
+                   settings=content['settings'],
+                   config_strs=content.get('config_files',{}))
+
+    @staticmethod
+    def parse_shard(shard):
+        #shard is given as i/n, with i from 1 to n
+        try:
+            index,n_shards = [int(number) for number in shard.split('/')]
+        except ValueError:
+            raise ValueError(f'shard needs to be given as i/n (e.g. 2/8), not {shard}')
+        if not 1 <= index <= n_shards:
+            raise ValueError(f'invalid shard {shard}, i needs to be between 1 and n')
+        return index,n_shards
+
+    def get_shard(self,index,n_shards):
+        #the jobs are dealt out in turn, such that all shards get long and
+        #short jobs
+        return self.jobs[index-1::n_shards]
+
+
+class ShardWorker():
+    """Runs one shard of a JobManifest. The log files and the results file of
+    the shard are written relative to the current directory, which can be
+    shared by all workers."""
+
+    def __init__(self,manifest,shard,n_jobs=1,cache=None,engine=None,resume=False,
+                 duration_history=None,keep_failed=False):
+        self.manifest = manifest
+        self.shard_index,self.n_shards = JobManifest.parse_shard(shard)
+        self.jobs = manifest.get_shard(index=self.shard_index,n_shards=self.n_shards)
+        self.n_jobs = n_jobs
+        self.cache = cache
+        self.engine = engine
+        self.resume = resume
+        self.keep_failed = keep_failed
+        self.duration_history = duration_history
+        self.results_filename = f'results_shard{self.shard_index}of{self.n_shards}.jsonl'
+
+    @staticmethod
+    def get_results_files():
+        return sorted(glob.glob('results_shard*of*.jsonl'))
+
+    def prepare_results_store(self):
+        journal = {}
+        if self.resume and os.path.exists(self.results_filename):
+            print(f'resuming from journal {self.results_filename}')
+            journal = ResultsStore(filepath=self.results_filename).get_journal()
+        elif os.path.exists(self.results_filename):
+            print(f'deleting {self.results_filename}')
+            os.remove(self.results_filename)
+        self.results_store = ResultsStore(filepath=self.results_filename)
+        return journal
+
+    def create_SB_simulations(self,xml_folder,journal):
+        groups = {}
+        for job in self.jobs:
+            key = (job['xml_file'],job['array_config'],job['obs_date'],job['log_folder'])
+            groups.setdefault(key,[]).append(job['HA'])
+        SB_simulations = []
+        xml_data = {}
+        settings = self.manifest.settings
+        prescreen = None
+        if settings.get('prescreen',False):
+            prescreen = Prescreen(min_elevation_deg=settings['min_elevation'],
+                                  min_sun_separation_deg=settings['min_sun_separation'])
+        for (xml_file,array_config,obs_date,log_folder),HAs in groups.items():
+            if xml_file not in xml_data:
+                xml_str = self.manifest.xml_strs[xml_file]
+                with open(os.path.join(xml_folder,xml_file),'w') as file:
+                    file.write(xml_str)
+                xml_data[xml_file] = OT_XML_File(filepath=None,xml_str=xml_str)
+            array_config_file = None
+            if array_config in self.manifest.config_strs:
+                array_config_file = os.path.join(xml_folder,os.path.basename(array_config))
+                if not os.path.exists(array_config_file):
+                    with open(array_config_file,'w') as file:
+                        file.write(self.manifest.config_strs[array_config])
+            os.makedirs(log_folder,exist_ok=True)
+            #each shard has its own archive, since several workers can write
+            #into the same log folder
+            log_archive = None
+            if settings.get('log_archive',False):
+                log_archive = LogArchive(filepath=os.path.join(
+                   log_folder,f'logs_shard{self.shard_index}of{self.n_shards}.zip'))
+            sim = SBSimulation(
+                    xml_file=os.path.join(xml_folder,xml_file),
+                    xml_data=xml_data[xml_file],log_folder=log_folder,
+                    min_HA=None,max_HA=None,HA_step=None,HAs=sorted(HAs),
+                    obs_date=obs_date,writeQueryLog=settings['writeQueryLog'],
+                    array_config=array_config,array_config_file=array_config_file,
+                    check_array_config=False,
+                    cache=self.cache,engine=self.engine,
+                    log_archive=log_archive,prescreen=prescreen,
+                    duration_history=self.duration_history,
+                    timeout=settings['timeout'],
+                    fatal_patterns=settings['fatal_patterns'],
+                    results_store=self.results_store,
+                    journal_records=journal.get((xml_file,array_config,obs_date)),
+                    keep_failed=self.keep_failed)
+            sim.prepare()
+            SB_simulations.append(sim)
+        return SB_simulations
+
+    def run(self):
+        journal = self.prepare_results_store()
+        xml_folder = tempfile.mkdtemp(prefix='simulateSB_HA_wrapper_xmls_')
+        try:
+            SB_simulations = self.create_SB_simulations(xml_folder=xml_folder,
+                                                        journal=journal)
+            jobs = [(sim,HA_index) for sim in SB_simulations
+                    for HA_index in sim.select_HA_indices_to_simulate(
+                                                  HA_indices=range(len(sim.HAs)))]
+            print(f'shard {self.shard_index}/{self.n_shards}: going to run {len(jobs)}'
+                  +f' simulations using {self.n_jobs} parallel job(s)')
+            run_in_parallel(function=Simulation.run_job,
+                            arguments=Simulation.schedule_jobs(jobs),n_jobs=self.n_jobs)
+        finally:
+            shutil.rmtree(xml_folder)
+            if self.engine is not None:
+                self.engine.close()
+            if self.duration_history is not None:
+                self.duration_history.write()
+        for sim in SB_simulations:
+            #the summaries are written when the shards are merged
+            sim.sort_by_HA()
+            print(f'\nresults of {sim.xml_filename} ({sim.array_config}) in {sim.log_folder}')
+            sim.print_results()
+        print(f'results of shard {self.shard_index}/{self.n_shards}: {self.results_filename}')
 
 
 if __name__ == '__main__':
-    xml = OT_XML_File('G022.25_a_09_7M_query.xml')
\ No newline at end of file
+    xml = OT_XML_File('G022.25_a_09_7M_query.xml')